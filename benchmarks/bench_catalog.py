@@ -0,0 +1,70 @@
+"""
+Memory and time of catalog query results: Database/Column records with and without __slots__,
+row-oriented vs column-oriented (ColumnarResult) results of get_table_structure
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.harness import measure
+from ms_admin_utils.sql_wrapper import Database, Column, ColumnarResult
+
+
+class DictDatabase:
+    """Database record with a per-instance __dict__, as it was before __slots__"""
+    def __init__(self, data_row):
+        for k in Database.__slots__:
+            setattr(self, k, getattr(data_row, k))
+
+
+def _db_rows(count: int):
+    create_date = datetime(2020, 1, 1)
+    for i in range(count):
+        yield SimpleNamespace(server='SQL01', name=f'db_{i}', create_date=create_date, compatibility_level=150,
+                              user_access_desc='MULTI_USER', is_read_only=False, state_desc='ONLINE',
+                              is_in_standby=False, is_cleanly_shutdown=False, recovery_model_desc='SIMPLE',
+                              is_fulltext_enabled=False, is_master_key_encrypted_by_server=False,
+                              is_broker_enabled=False, is_encrypted=False, recovery_mode='SIMPLE',
+                              status='ONLINE', user_access='MULTI_USER',
+                              # the same names as the record attributes for DictDatabase
+                              state='ONLINE', recovery_model='SIMPLE')
+
+
+def _column_rows(count: int, columns_per_table: int = 40):
+    for i in range(count):
+        # new string objects for every row, as they come from the driver
+        yield ''.join(('table_', str(i // columns_per_table))), ''.join(('column_', str(i % columns_per_table)))
+
+
+def run(workdir: str, scale: int = 1) -> list:
+    rows = 200000 * scale
+    results = []
+
+    def measure_memory(name, func):
+        results.append(measure(name, func, repeat=1, memory=True, rows=rows)[0])
+
+    db_rows = list(_db_rows(rows // 10))
+    measure_memory('catalog.database_dict', lambda: [DictDatabase(r) for r in db_rows])
+    measure_memory('catalog.database_slots', lambda: [Database(r) for r in db_rows])
+    column_rows = [SimpleNamespace(name=f'column_{i}', type='nvarchar', max_length=100, precision=0, scale=0,
+                                   is_nullable=True, is_identity=False, is_computed=False)
+                   for i in range(rows // 10)]
+    measure_memory('catalog.column_slots', lambda: [Column(r) for r in column_rows])
+    del db_rows, column_rows
+
+    def table_structure_rows():
+        tables = {}
+        for t, c in _column_rows(rows):
+            if t in tables:
+                tables[t].append(c)
+            else:
+                tables[t] = [c]
+        return tables
+
+    measure_memory('catalog.table_structure_rows', lambda: [r for r in _column_rows(rows)])
+    measure_memory('catalog.table_structure_dict', table_structure_rows)
+    columnar = ColumnarResult.from_rows(['table_name', 'column_name'], _column_rows(rows))
+    measure_memory('catalog.table_structure_columnar',
+                   lambda: ColumnarResult.from_rows(['table_name', 'column_name'], _column_rows(rows)))
+    measure_memory('catalog.table_structure_columnar_to_dict', lambda: columnar.group('table_name', 'column_name'))
+    return results
+
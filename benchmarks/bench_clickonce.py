@@ -0,0 +1,67 @@
+"""
+clickonce_wrapper: version scanning of all applications under the publish root,
+full rescan by ClickonceApplication vs ClickonceIndex (cold scan, incremental refresh, snapshot load),
+hardlink-deduplicated publishing and retention
+"""
+import os
+import shutil
+from os import path as os_path
+
+from benchmarks.fixtures import make_clickonce_root
+from benchmarks.harness import measure
+from ms_admin_utils import clickonce_wrapper
+
+
+def run(workdir: str, scale: int = 1) -> list:
+    results = []
+    root = os_path.join(workdir, 'clickonce')
+    apps = make_clickonce_root(root, apps=6 * scale, versions=100)
+    clickonce_wrapper.configure(root_path=root, app_folder='Application Files')
+    r, _ = measure('clickonce.load_all_applications',
+                   lambda: [clickonce_wrapper.ClickonceApplication(**kwargs) for kwargs in apps],
+                   apps=len(apps), versions=100)
+    results.append(r)
+
+    snapshot = os_path.join(workdir, 'clickonce_index.json')
+    r, index = measure('clickonce.index.cold_scan', lambda: _cold_index(snapshot), apps=len(apps), versions=100)
+    results.append(r)
+    r, _ = measure('clickonce.index.refresh_unchanged', index.refresh, apps=len(apps))
+    results.append(r)
+
+    def touch_one_app():
+        app_path = os_path.join(root, apps[0]['folder'], 'Application Files')
+        os.makedirs(os_path.join(app_path, f"{apps[0]['prefix']}_1_0_1_0"), exist_ok=True)
+        os.utime(app_path)
+
+    r, _ = measure('clickonce.index.refresh_one_changed', index.refresh, setup=touch_one_app, apps=len(apps))
+    results.append(r)
+    r, _ = measure('clickonce.index.load_snapshot', lambda: clickonce_wrapper.ClickonceIndex(snapshot),
+                   apps=len(apps))
+    results.append(r)
+    r, _ = measure('clickonce.load_all_applications.indexed',
+                   lambda: [clickonce_wrapper.ClickonceApplication(index=index, **kwargs) for kwargs in apps],
+                   apps=len(apps), versions=100)
+    results.append(r)
+
+    publish_root = os_path.join(workdir, 'publish')
+    publish_apps = make_clickonce_root(publish_root, apps=1, versions=2, files_per_version=200 * scale)
+    clickonce_wrapper.configure(root_path=publish_root, app_folder='Application Files')
+    app = clickonce_wrapper.ClickonceApplication(**publish_apps[0])
+    source = os_path.join(workdir, 'publish_source')
+    shutil.copytree(os_path.join(publish_root, app.folder, 'Application Files', app.last_version.folder), source)
+    with open(os_path.join(source, 'lib_0.dll'), 'wb') as f:
+        f.write(os.urandom(256))
+    r, _ = measure('clickonce.publish', lambda: app.publish(source), files=200 * scale)
+    results.append(r)
+    r, _ = measure('clickonce.prune_versions', lambda: app.prune_versions(keep_last=1), repeat=1,
+                   versions=len(app.versions))
+    results.append(r)
+    return results
+
+
+def _cold_index(snapshot: str):
+    if os_path.exists(snapshot):
+        os.remove(snapshot)
+    index = clickonce_wrapper.ClickonceIndex(snapshot)
+    index.refresh()
+    return index
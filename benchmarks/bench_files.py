@@ -0,0 +1,40 @@
+"""
+file_wrapper: walk_through_files, zip_backup and get_last_backup_file on synthetic trees
+"""
+import shutil
+from os import path as os_path, makedirs
+
+from benchmarks.fixtures import make_tree, make_backup_folder
+from benchmarks.harness import measure
+from ms_admin_utils.file_wrapper import walk_through_files, zip_backup, get_last_backup_file
+
+
+def run(workdir: str, scale: int = 1) -> list:
+    results = []
+    source = os_path.join(workdir, 'tree')
+    files = make_tree(source, dirs=10 * scale, depth=2, files_per_dir=20)
+
+    r, found = measure('files.walk_through_files.all', lambda: sum(1 for _ in walk_through_files(source, [])),
+                       files=files)
+    results.append(r)
+    r, _ = measure('files.walk_through_files.sql', lambda: sum(1 for _ in walk_through_files(source, ['.sql'])),
+                   files=files)
+    results.append(r)
+
+    target = os_path.join(workdir, 'zip')
+
+    def reset_target():
+        shutil.rmtree(target, ignore_errors=True)
+        makedirs(target)
+
+    r, _ = measure('files.zip_backup.folder',
+                   lambda: zip_backup(source, target, freq=1, file_format='zip', base_name='tree'),
+                   setup=reset_target, files=files)
+    results.append(r)
+
+    backups = os_path.join(workdir, 'backups')
+    make_backup_folder(backups, 'tree', files=200 * scale)
+    r, _ = measure('files.get_last_backup_file', lambda: get_last_backup_file(backups, 'tree', ['.zip']),
+                   files=400 * scale)
+    results.append(r)
+    return results
@@ -0,0 +1,31 @@
+"""
+Import time of the package modules in a fresh interpreter (python -X importtime),
+and whether the import loads pyodbc
+"""
+import subprocess
+import sys
+
+MODULES = ('ms_admin_utils', 'ms_admin_utils.file_wrapper', 'ms_admin_utils.clickonce_wrapper',
+           'ms_admin_utils.sql_wrapper', 'ms_admin_utils.cli')
+
+
+def import_time(module: str) -> (float, bool):
+    code = f"import {module}, sys; print('pyodbc' in sys.modules)"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                          check=True)
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6, proc.stdout.strip() == 'True'
+    return 0.0, proc.stdout.strip() == 'True'
+
+
+def run(workdir: str, scale: int = 1, repeat: int = 5) -> list:
+    results = []
+    for module in MODULES:
+        timings = [import_time(module) for _ in range(repeat)]
+        results.append({'name': f'import.{module}',
+                        'seconds': round(min(t for t, _ in timings), 6),
+                        'repeat': repeat,
+                        'pyodbc_loaded': timings[0][1]})
+    return results
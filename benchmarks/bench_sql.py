@@ -0,0 +1,85 @@
+"""
+sql_wrapper against the local stand-in backend (benchmarks/fake_odbc.py):
+catalog queries, script execution, job steps, bulk load into SQLite and concurrent native backups
+"""
+import os
+import sqlite3
+from os import path as os_path
+
+from benchmarks.fake_odbc import catalog_backend, FakeOdbcError
+from benchmarks.fixtures import make_tree
+from benchmarks.harness import measure
+from ms_admin_utils import sql_wrapper
+
+
+def run(workdir: str, scale: int = 1, connect_latency: float = 0.0, query_latency: float = 0.0) -> list:
+    results = []
+    sqlite_path = os_path.join(workdir, 'bench.sqlite')
+    with sqlite3.connect(sqlite_path) as db:
+        db.execute('create table bulk (id integer not null, name text, amount real, created text)')
+        db.execute('create table bulk_unique (id integer not null unique, name text)')
+    backend = catalog_backend(databases=500 * scale, tables=500 * scale, columns_per_table=40,
+                              connect_latency=connect_latency, query_latency=query_latency, sqlite_path=sqlite_path)
+    sql_wrapper.configure(connector=backend.connect, errors=FakeOdbcError)
+    extra = {'connect_latency': connect_latency, 'query_latency': query_latency}
+
+    r, _ = measure('sql.get_dbs', lambda: sql_wrapper.get_dbs('SQL01', None), memory=True,
+                   databases=500 * scale, **extra)
+    results.append(r)
+    r, _ = measure('sql.get_table_structure', lambda: sql_wrapper.get_table_structure('SQL01.db'), memory=True,
+                   columns=500 * scale * 40, **extra)
+    results.append(r)
+    r, _ = measure('sql.get_table_structure.columnar',
+                   lambda: sql_wrapper.get_table_structure('SQL01.db', columnar=True), memory=True,
+                   columns=500 * scale * 40, **extra)
+    results.append(r)
+
+    scripts = os_path.join(workdir, 'scripts')
+    scripts_count = make_tree(scripts, dirs=5, depth=1, files_per_dir=20, extensions=('.sql',))
+    r, _ = measure('sql.execute_scripts', lambda: sql_wrapper.execute_scripts('SQL01', 'db', scripts),
+                   scripts=scripts_count, **extra)
+    results.append(r)
+
+    def job_steps():
+        for i in range(20):
+            sql_wrapper.sql_job_add_next_step('SQL01', 'bench_job', f'step_{i}', 'db', 'select 1')
+        sql_wrapper.sql_job_remove_steps('SQL01', 'bench_job')
+
+    r, _ = measure('sql.job_steps.add_remove_20', job_steps, **extra)
+    results.append(r)
+
+    rows = [(i, f'name_{i}', str(i * 1.5), '2020-01-01') for i in range(20000 * scale)]
+    r, _ = measure('sql.bulk_load', lambda: sql_wrapper.bulk_load(rows, 'bulk', 'SQL01', 'db', batch_size=1000),
+                   rows=len(rows), **extra)
+    results.append(r)
+
+    # a duplicate key in every batch: the failed batches are rolled back and reloaded row by row
+    rows = [(i - i % 1000 if i % 1000 == 999 else i, f'name_{i}') for i in range(5000 * scale)]
+
+    def clear_unique():
+        backend.sqlite.execute('delete from bulk_unique')
+        backend.sqlite.commit()
+
+    r, loaded = measure('sql.bulk_load.rejected_rows',
+                        lambda: sql_wrapper.bulk_load(rows, 'bulk_unique', 'SQL01', 'db', batch_size=1000),
+                        setup=clear_unique, rows=len(rows), **extra)
+    assert len(loaded.rejected) == len(rows) // 1000, loaded.rejected[:3]
+    results.append(r)
+
+    backup_backend = catalog_backend(databases=20, backup_seconds=0.02, connect_latency=connect_latency,
+                                     query_latency=query_latency)
+    sql_wrapper.configure(connector=backup_backend.connect, errors=FakeOdbcError)
+    targets = [os_path.join(workdir, f'backup_{i}') for i in range(4)]
+    journal = os_path.join(workdir, 'backup_journal.json')
+    for max_workers in (1, 4):
+        r, _ = measure(f'sql.backup.workers_{max_workers}',
+                       lambda: sql_wrapper.sql_backup('SQL01', targets, freq=1, max_workers=max_workers,
+                                                      journal_path=journal),
+                       setup=lambda: os_path.exists(journal) and os.remove(journal),
+                       databases=20, backup_seconds=0.02, **extra)
+        results.append(r)
+    r, _ = measure('sql.backup.frequency_check', lambda: sql_wrapper.sql_backup('SQL01', targets, freq=1,
+                                                                                journal_path=journal),
+                   databases=20, **extra)
+    results.append(r)
+    return results
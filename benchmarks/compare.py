@@ -0,0 +1,42 @@
+"""
+Compare two benchmark result files, exit code 1 if any benchmark is slower than the threshold:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return {r['name']: r for r in json.load(f)['results']}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """List of (name, baseline seconds, current seconds, ratio, is_regression)"""
+    rows = []
+    for name, r in current.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]['seconds']
+        ratio = r['seconds'] / base if base else 1.0
+        rows.append((name, base, r['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ms_admin_utils benchmark results')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 = 10%%')
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.current), args.threshold)
+    for name, base, cur, ratio, is_regression in rows:
+        print(f"{name:<44}{base:>12.6f}{cur:>12.6f}{ratio:>8.2f}x{'  REGRESSION' if is_regression else ''}")
+    sys.exit(1 if any(r[4] for r in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
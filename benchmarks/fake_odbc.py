@@ -0,0 +1,260 @@
+"""
+Local stand-in for pyodbc connections, plugged into sql_wrapper with
+sql_wrapper.configure(connector=backend.connect, errors=FakeOdbcError).
+
+Queries are matched against scripted handlers (regex -> result set) first,
+everything else goes to an optional SQLite database, so inserts and selects
+of user tables (bulk_load) work without SQL Server.
+Connection and query latency are simulated with sleep.
+"""
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+from re import compile as re_compile, IGNORECASE, DOTALL
+from threading import Lock
+from time import sleep
+from typing import Callable, List
+
+
+class FakeOdbcError(Exception):
+    """Raised for failed SQLite statements, args are (sqlstate, message) as in pyodbc.Error"""
+
+
+class ResultSet:
+    def __init__(self, columns: List[str], rows: List[tuple], types: List[type] = None):
+        self.columns = columns
+        self.rows = rows
+        self.types = types or [type(v) if v is not None else str for v in (rows[0] if rows else columns)]
+
+    @property
+    def description(self):
+        return [(c, t, None, None, None, None, True) for c, t in zip(self.columns, self.types)]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self.description = None
+        self.__rows = iter(())
+        self.__row_type = None
+
+    def __set_result(self, result: ResultSet):
+        if result is None:
+            self.description, self.__rows, self.__row_type = None, iter(()), None
+            return
+        self.description = result.description
+        self.__row_type = namedtuple('Row', result.columns, rename=True)
+        self.__rows = iter(result.rows)
+
+    def execute(self, query: str, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        self.__set_result(self.connection.backend.execute(self.connection, query, params))
+        return self
+
+    def executemany(self, query: str, seq_of_params):
+        self.connection.backend.executemany(self.connection, query, seq_of_params)
+        self.__set_result(None)
+
+    def fetchone(self):
+        for row in self.__rows:
+            return self.__row_type._make(row)
+
+    def fetchmany(self, size: int = 1):
+        rows = []
+        for row in self.__rows:
+            rows.append(self.__row_type._make(row))
+            if len(rows) >= size:
+                break
+        return rows
+
+    def fetchall(self):
+        return [self.__row_type._make(row) for row in self.__rows]
+
+    def nextset(self):
+        return False
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class FakeConnection:
+    def __init__(self, backend, database: str, autocommit: bool):
+        self.backend = backend
+        self.database = database
+        self.autocommit = autocommit
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.backend.commit()
+
+    def rollback(self):
+        self.backend.rollback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # pyodbc commits on exit of the with block and does not close the connection
+        if not exc_type and not self.autocommit:
+            self.commit()
+
+
+class FakeBackend:
+    """
+    Scripted/SQLite backend. Handlers get the regex match, query params and the backend
+    and return a ResultSet (or None for statements without results)
+    """
+    def __init__(self, connect_latency: float = 0.0, query_latency: float = 0.0, sqlite_path: str = None):
+        self.connect_latency = connect_latency
+        self.query_latency = query_latency
+        self.handlers = []
+        self.queries: List[str] = []
+        self.connections = 0
+        self.sqlite = sqlite3.connect(sqlite_path, check_same_thread=False) if sqlite_path else None
+        self.lock = Lock()
+
+    def script(self, pattern: str, handler: Callable):
+        self.handlers.append((re_compile(pattern, IGNORECASE | DOTALL), handler))
+        return self
+
+    def connect(self, *args, **kwargs):
+        with self.lock:
+            self.connections += 1
+        if self.connect_latency:
+            sleep(self.connect_latency)
+        return FakeConnection(self, kwargs.get('Database'), kwargs.get('autocommit', False))
+
+    def __find_handler(self, query: str):
+        for pattern, handler in self.handlers:
+            m = pattern.search(query)
+            if m:
+                return m, handler
+        return None, None
+
+    def execute(self, connection, query: str, params):
+        with self.lock:
+            self.queries.append(query)
+        if self.query_latency:
+            sleep(self.query_latency)
+        m, handler = self.__find_handler(query)
+        if handler:
+            return handler(m, params, self)
+        if not self.sqlite:
+            return None
+        with self.lock:
+            try:
+                if not params and query.strip().rstrip(';').count(';'):
+                    # a script with several statements, e.g. from execute_scripts
+                    self.sqlite.executescript(query)
+                    return None
+                cursor = self.sqlite.execute(query, params)
+            except sqlite3.Error as ex:
+                raise FakeOdbcError('HY000', str(ex))
+            if not cursor.description:
+                return None
+            return ResultSet([d[0] for d in cursor.description], cursor.fetchall())
+
+    def executemany(self, connection, query: str, seq_of_params):
+        with self.lock:
+            self.queries.append(query)
+        if self.query_latency:
+            sleep(self.query_latency)
+        with self.lock:
+            try:
+                self.sqlite.executemany(query, seq_of_params)
+            except sqlite3.Error as ex:
+                raise FakeOdbcError('HY000', str(ex))
+
+    def commit(self):
+        if self.sqlite:
+            with self.lock:
+                self.sqlite.commit()
+
+    def rollback(self):
+        if self.sqlite:
+            with self.lock:
+                self.sqlite.rollback()
+
+
+DATABASE_COLUMNS = ['server', 'name', 'create_date', 'compatibility_level', 'user_access_desc', 'is_read_only',
+                    'state_desc', 'is_in_standby', 'is_cleanly_shutdown', 'recovery_model_desc',
+                    'is_fulltext_enabled', 'is_master_key_encrypted_by_server', 'is_broker_enabled', 'is_encrypted',
+                    'recovery_mode', 'status', 'user_access']
+SQLITE_TYPES = {'INTEGER': 'bigint', 'REAL': 'float', 'TEXT': 'nvarchar', 'NUMERIC': 'decimal', 'BLOB': 'varbinary'}
+
+
+def catalog_backend(databases: int = 100,
+                    tables: int = 100,
+                    columns_per_table: int = 20,
+                    job_steps: int = 10,
+                    connect_latency: float = 0.0,
+                    query_latency: float = 0.0,
+                    sqlite_path: str = None,
+                    backup_seconds: float = 0.0,
+                    backup_size: int = 100 * 2 ** 20) -> FakeBackend:
+    """
+    Backend with synthetic catalog result sets for get_dbs, get_table_structure, get_columns
+    (from the SQLite schema), the SQL job step helpers and native backups (backup_seconds per database)
+    """
+    backend = FakeBackend(connect_latency, query_latency, sqlite_path)
+    create_date = datetime(2020, 1, 1)
+    dbs = [('SQL01', f'db_{i}', create_date, 150, 'MULTI_USER', False, 'ONLINE', False, False, 'FULL',
+            False, False, False, False, 'FULL', 'ONLINE', 'MULTI_USER') for i in range(databases)]
+    structure = [(f'table_{t}', f'column_{c}') for t in range(tables) for c in range(columns_per_table)]
+    steps = {'job_id': [(i, 'job', f'step_{i}') for i in range(1, job_steps + 1)]}
+
+    def get_dbs(m, params, b):
+        rows = [r for r in dbs if r[1] == m.group(1)] if m.group(1) else dbs
+        return ResultSet(DATABASE_COLUMNS, rows)
+
+    def get_columns(m, params, b):
+        rows = []
+        if b.sqlite:
+            with b.lock:
+                info = b.sqlite.execute(f'pragma table_info({m.group(1)})').fetchall()
+            # an integer primary key is the SQLite counterpart of an identity column
+            rows = [(name, SQLITE_TYPES.get(t.upper(), t.lower()), -1, 0, 0, not notnull,
+                     bool(pk) and t.upper() == 'INTEGER', False)
+                    for _, name, t, notnull, _, pk in info]
+        return ResultSet(['name', 'type', 'max_length', 'precision', 'scale', 'is_nullable', 'is_identity',
+                          'is_computed'], rows, [str, str, int, int, int, bool, bool, bool])
+
+    def next_step_id(m, params, b):
+        return ResultSet(['step_id'], [(len(steps.get(m.group(1), [])) + 1,)])
+
+    def job_steps_list(m, params, b):
+        rows = sorted(steps.get(m.group(1), []), reverse=m.group(2).lower() == 'desc')
+        return ResultSet(['step_id', 'job_name', 'step_name'], [(s, j, n) for s, j, n in rows], [int, str, str])
+
+    def add_job_step(m, params, b):
+        job = steps.setdefault(m.group(1), [])
+        job.append((int(m.group(3)), 'job', m.group(2)))
+
+    def delete_job_step(m, params, b):
+        steps[m.group(1)] = [s for s in steps.get(m.group(1), []) if s[0] != int(m.group(2))]
+
+    def backup(m, params, b):
+        if backup_seconds:
+            sleep(backup_seconds)
+
+    backend.script(r"^backup (?:database|log) \[", backup)
+    backend.script(r"compressed_backup_size as size from dbo\.backupset",
+                   lambda m, p, b: ResultSet(['size'], [(backup_size,)]))
+    backend.script(r"^set identity_insert ", lambda m, p, b: None)
+    backend.script(r"from sys\.databases d\s+(?:where name = '([^']*)'|where d\.name not in)", get_dbs)
+    backend.script(r"select t\.name as table_name, c\.name as column_name",
+                   lambda m, p, b: ResultSet(['table_name', 'column_name'], structure))
+    backend.script(r"from\s+sys\.columns c .*object_id\('([^']+)'\)", get_columns)
+    backend.script(r"max\(step_id\) from \[dbo\]\.\[sysjobsteps\] where job_id = '([^']+)'", next_step_id)
+    backend.script(r"from dbo\.sysjobsteps s .*where s\.job_id = '([^']+)' order by s\.step_id (\w+)",
+                   job_steps_list)
+    backend.script(r"sp_add_jobstep\] @job_id = '([^']+)',@step_name = N'([^']*)',@step_id = (\d+)", add_job_step)
+    backend.script(r"sp_delete_jobstep\] @job_id = '([^']+)' ,@step_id = (\d+)", delete_job_step)
+    return backend
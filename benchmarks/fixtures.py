@@ -0,0 +1,58 @@
+"""
+Synthetic directory trees for the file and ClickOnce benchmarks
+"""
+import os
+from datetime import datetime, timedelta
+from os import path as os_path, makedirs, utime
+
+
+def make_tree(root: str, dirs: int = 20, depth: int = 2, files_per_dir: int = 50, file_size: int = 1024,
+              extensions: tuple = ('.sql', '.txt', '.log')):
+    """Tree of dirs ** depth folders with files_per_dir files each, returns the number of files"""
+    payload = b'select 1;\n' * max(file_size // 10, 1)
+    count = 0
+    folders = [root]
+    for _ in range(depth):
+        folders = [os_path.join(f, f'dir_{i}') for f in folders for i in range(dirs)]
+    for folder in folders:
+        makedirs(folder, exist_ok=True)
+        for i in range(files_per_dir):
+            with open(os_path.join(folder, f'file_{i}{extensions[i % len(extensions)]}'), 'wb') as f:
+                f.write(payload)
+            count += 1
+    return count
+
+
+def make_backup_folder(target: str, base_name: str, files: int = 500):
+    """Zip backups named as get_last_backup_file expects them, one per day"""
+    makedirs(target, exist_ok=True)
+    today = datetime.today()
+    for i in range(files):
+        dt = today - timedelta(days=i)
+        path = os_path.join(target, f'{base_name}_{dt:%Y%m%d}.zip')
+        with open(path, 'wb') as f:
+            f.write(b'PK')
+        utime(path, (dt.timestamp(), dt.timestamp()))
+    for i in range(files):
+        with open(os_path.join(target, f'other_{i}.zip'), 'wb') as f:
+            f.write(b'PK')
+
+
+def make_clickonce_root(root: str, app_folder: str = 'Application Files', apps: int = 60, versions: int = 200,
+                        files_per_version: int = 0):
+    """ClickOnce publish root: root/app_N/<app_folder>/AppN_1_0_0_V, returns the list of app kwargs"""
+    apps_kwargs = []
+    start = datetime(2020, 1, 1)
+    for a in range(apps):
+        prefix = f'App{a}'
+        app_path = os_path.join(root, f'app_{a}', app_folder)
+        for v in range(1, versions + 1):
+            version_path = os_path.join(app_path, f'{prefix}_1_0_0_{v}')
+            makedirs(version_path, exist_ok=True)
+            for i in range(files_per_version):
+                with open(os_path.join(version_path, f'lib_{i}.dll'), 'wb') as f:
+                    f.write(os.urandom(256))
+            ts = (start + timedelta(days=v)).timestamp()
+            utime(version_path, (ts, ts))
+        apps_kwargs.append({'folder': f'app_{a}', 'prefix': prefix})
+    return apps_kwargs
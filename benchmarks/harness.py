@@ -0,0 +1,34 @@
+"""
+Measurement helpers shared by the benchmark modules. Every benchmark result is a dict:
+{'name', 'seconds' (best of repeats), 'median', 'repeat', 'peak_mb', ...extra}
+"""
+import tracemalloc
+from statistics import median
+from time import perf_counter
+from typing import Callable
+
+
+def measure(name: str, func: Callable, repeat: int = 3, memory: bool = False, setup: Callable = None, **extra):
+    timings = []
+    peak = None
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = perf_counter()
+        result = func()
+        timings.append(perf_counter() - start)
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    record = {'name': name,
+              'seconds': round(min(timings), 6),
+              'median': round(median(timings), 6),
+              'repeat': repeat,
+              'peak_mb': round(peak / 2 ** 20, 3) if peak is not None else None}
+    record.update(extra)
+    return record, result
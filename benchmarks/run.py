@@ -0,0 +1,76 @@
+"""
+Run the benchmark suite and save machine-readable results:
+
+    python -m benchmarks.run --output results.json [--scale 2] [--only files,sql] [--connect-latency 0.005]
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import json
+import platform
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime
+from importlib import import_module
+from logging import getLogger
+from tempfile import TemporaryDirectory
+
+import ms_admin_utils
+from ms_admin_utils import metrics
+
+logger = getLogger('logger')
+SUITES = ('import', 'files', 'clickonce', 'catalog', 'sql')
+
+
+def run_suites(suites, scale: int = 1, connect_latency: float = 0.0, query_latency: float = 0.0) -> dict:
+    report = {'version': ms_admin_utils.__version__,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'created': datetime.now().isoformat(timespec='seconds'),
+              'scale': scale,
+              'results': [],
+              'skipped': {}}
+    for suite in suites:
+        try:
+            module = import_module(f'benchmarks.bench_{suite}')
+        except ImportError as ex:
+            # e.g. pyodbc is installed without the unixODBC driver manager
+            report['skipped'][suite] = str(ex)
+            print(f'{suite}: skipped ({ex})', file=sys.stderr)
+            continue
+        kwargs = {'connect_latency': connect_latency, 'query_latency': query_latency} if suite == 'sql' else {}
+        # keep stdout clean for the JSON report (execute_scripts prints the queries)
+        with TemporaryDirectory(prefix=f'ms_admin_bench_{suite}_') as workdir, redirect_stdout(sys.stderr):
+            for r in module.run(workdir, scale, **kwargs):
+                r['suite'] = suite
+                report['results'].append(r)
+                print(f"{r['name']:<44}{r['seconds']:>12.6f} s" +
+                      (f"{r['peak_mb']:>10.2f} MB" if r.get('peak_mb') is not None else ''), file=sys.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ms_admin_utils benchmarks')
+    parser.add_argument('--output', help='JSON file for the results, stdout by default')
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--only', help=f'comma-separated suites: {",".join(SUITES)}')
+    parser.add_argument('--connect-latency', type=float, default=0.0, help='simulated connection latency, seconds')
+    parser.add_argument('--query-latency', type=float, default=0.0, help='simulated query latency, seconds')
+    parser.add_argument('--metrics', action='store_true', help='run with the instrumentation enabled')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+    suites = args.only.split(',') if args.only else SUITES
+    report = run_suites(suites, args.scale, args.connect_latency, args.query_latency)
+    if args.metrics:
+        report['metrics'] = metrics.snapshot()
+        print(metrics.summary(), file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == '__main__':
+    main()
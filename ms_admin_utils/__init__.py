@@ -1,3 +1,18 @@
 __author__ = 'vutt.gray@gmail.com'
 __version__ = '0.0.1'
 __package__ = 'ms_admin_utils'
+
+# Submodules and heavy dependencies (pyodbc, zipfile, hashlib, concurrent.futures) are loaded on first use,
+# so short cron tasks pay only for what they touch: `ms_admin_utils.file_wrapper` never imports pyodbc
+_SUBMODULES = ('cli', 'clickonce_wrapper', 'file_wrapper', 'metrics', 'sql_wrapper')
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        from importlib import import_module
+        return import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
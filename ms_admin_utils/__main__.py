@@ -0,0 +1,5 @@
+import sys
+
+from ms_admin_utils.cli import main
+
+sys.exit(main())
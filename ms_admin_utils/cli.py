@@ -0,0 +1,278 @@
+"""
+Console entry point:
+
+    ms-admin [--config CONFIG] run TASKS_FILE
+    ms-admin [--config CONFIG] daemon --queue QUEUE_DIR [--interval 1]
+
+A tasks file holds one task or a list of tasks:
+
+    {"type": "backup", "tasks": [...file_wrapper.backup tasks...]}
+    {"type": "restore", "params": {...sql_wrapper.restore_db arguments...}}
+    {"type": "script", "server": "SQL01", "db": "db", "scripts_folder": "C:\\scripts"}
+    {"type": "inventory", "servers": ["SQL01"], "refresh": false}
+
+The daemon takes *.json files from the queue folder (write them as *.tmp and rename),
+moves them to processing/ and then to done/ or failed/ with the results.
+One daemon serves a queue folder: it holds a lock on daemon.lock in the folder, released by the OS
+when the process ends. Files left in processing/ by a stopped daemon are moved to failed/ on start,
+they are not run again.
+It keeps its state warm between tasks: the ClickOnce version index, the database lists
+per server and the ODBC driver manager connection pool of the long-running process.
+The config file is JSON: {"sql": {...SqlConfig...}, "clickonce": {"root_path", "app_folder", "snapshot_path"},
+"databases_ttl": 300}
+"""
+import argparse
+import json
+import sys
+import traceback
+from datetime import datetime
+from logging import getLogger, basicConfig, INFO
+from os import path as os_path, listdir, makedirs, replace, remove
+from time import sleep, perf_counter, monotonic
+
+from ms_admin_utils import metrics
+
+logger = getLogger('logger')
+
+
+class UnsupportedTask(Exception):
+    pass
+
+
+class QueueLocked(Exception):
+    pass
+
+
+class AdminState:
+    """
+    State kept between tasks: configuration, ClickOnce version index and cached database lists
+    """
+    def __init__(self, config: dict):
+        self.config = config
+        self.databases_ttl = config.get('databases_ttl', 300)
+        self.databases = {}  # server -> (loaded at, [Database])
+        self.clickonce_index = None
+        if 'sql' in config:
+            from ms_admin_utils import sql_wrapper
+            sql_wrapper.configure(**config['sql'])
+        if 'clickonce' in config:
+            from ms_admin_utils import clickonce_wrapper
+            clickonce = dict(config['clickonce'])
+            snapshot_path = clickonce.pop('snapshot_path', None)
+            clickonce_wrapper.configure(**clickonce)
+            self.clickonce_index = clickonce_wrapper.ClickonceIndex(snapshot_path)
+
+    def get_dbs(self, server: str, refresh: bool = False):
+        cached = self.databases.get(server)
+        if refresh or not cached or monotonic() - cached[0] > self.databases_ttl:
+            from ms_admin_utils import sql_wrapper
+            cached = self.databases[server] = (monotonic(), sql_wrapper.get_dbs(server, None))
+        return cached[1]
+
+    def invalidate(self, server: str):
+        self.databases.pop(server, None)
+
+
+def _backup_report(results: list) -> list:
+    return [[r.to_dict() for r in result] if isinstance(result, list) else result for result in results]
+
+
+def _run_backup(task: dict, state: AdminState):
+    from ms_admin_utils import file_wrapper
+    try:
+        return _backup_report(file_wrapper.backup(task['tasks'], get_dbs=state.get_dbs))
+    except file_wrapper.BackupTaskFailed as ex:
+        ex.results = _backup_report(ex.results)
+        raise
+
+
+def _run_restore(task: dict, state: AdminState):
+    from ms_admin_utils import sql_wrapper
+    sql_wrapper.restore_db(databases=state.get_dbs(task['params']['server']), **task['params'])
+    state.invalidate(task['params']['server'])
+
+
+def _run_script(task: dict, state: AdminState):
+    from ms_admin_utils import sql_wrapper
+    sql_wrapper.execute_scripts(task['server'], task['db'], task['scripts_folder'])
+
+
+def _run_inventory(task: dict, state: AdminState):
+    refresh = task.get('refresh', False)
+    result = {'databases': {server: [db.to_dict() for db in state.get_dbs(server, refresh)]
+                            for server in task.get('servers', [])}}
+    if state.clickonce_index:
+        index = state.clickonce_index
+        index.refresh()
+        result['clickonce'] = {folder: {'last_version': index.last_version(folder),
+                                        'next_version': index.next_version_number(folder)}
+                               for folder in sorted(index.apps)}
+    return result
+
+
+TASK_HANDLERS = {'backup': _run_backup,
+                 'restore': _run_restore,
+                 'script': _run_script,
+                 'inventory': _run_inventory}
+
+
+def run_task(task: dict, state: AdminState) -> dict:
+    started = datetime.now()
+    start = perf_counter()
+    record = {'type': None, 'started': started.isoformat(timespec='seconds')}
+    try:
+        if not isinstance(task, dict):
+            raise UnsupportedTask(f'A task must be an object, got {task!r}')
+        record['type'] = task.get('type')
+        handler = TASK_HANDLERS.get(task.get('type'))
+        if not handler:
+            raise UnsupportedTask(task)
+        with metrics.timed(f"task.{task['type']}"):
+            record['result'] = handler(task, state)
+        record['status'] = 'done'
+    except Exception as ex:
+        logger.exception(ex)
+        record['status'] = 'failed'
+        record['error'] = ''.join(traceback.format_exception_only(type(ex), ex)).strip()
+        if getattr(ex, 'results', None) is not None:
+            record['result'] = ex.results  # e.g. the backups done before and after a failed one
+    record['duration'] = round(perf_counter() - start, 3)
+    logger.info(f"Task {record['type']} {record['status']} in {record['duration']}s")
+    return record
+
+
+def run_tasks(tasks, state: AdminState) -> list:
+    return [run_task(task, state) for task in (tasks if isinstance(tasks, list) else [tasks])]
+
+
+def _write_json(path: str, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4, default=str)
+
+
+def _read_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _finish_task_file(folders: dict, file: str, tasks, results: list):
+    status = 'failed' if any(r['status'] == 'failed' for r in results) else 'done'
+    _write_json(os_path.join(folders[status], file), {'tasks': tasks, 'results': results})
+    remove(os_path.join(folders['processing'], file))
+
+
+def _fail_interrupted(folders: dict):
+    """Files left in processing/ by a stopped daemon: the tasks may be partly done, they are not run again"""
+    for file in listdir(folders['processing']):
+        logger.warning(f'Task file {file} was interrupted, moved to failed')
+        try:
+            tasks = _read_json(os_path.join(folders['processing'], file))
+        except (OSError, ValueError):
+            tasks = None
+        _finish_task_file(folders, file, tasks, [{'status': 'failed', 'error': 'Interrupted by the daemon stop'}])
+
+
+def _lock_queue(queue_path: str):
+    """Exclusive lock of the queue folder, the returned file keeps it until closed"""
+    lock_file = open(os_path.join(queue_path, 'daemon.lock'), 'a+')
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise QueueLocked(f'The queue {queue_path} is served by another daemon')
+    return lock_file
+
+
+def serve_queue(queue_path: str, state: AdminState, interval: float = 1.0, once: bool = False,
+                metrics_path: str = None):
+    folders = {name: os_path.join(queue_path, name) for name in ('processing', 'done', 'failed')}
+    for folder in folders.values():
+        makedirs(folder, exist_ok=True)
+    with _lock_queue(queue_path):
+        _fail_interrupted(folders)
+        _serve(queue_path, folders, state, interval, once, metrics_path)
+
+
+def _serve(queue_path: str, folders: dict, state: AdminState, interval: float, once: bool, metrics_path: str):
+    logger.info(f'Serve the task queue {queue_path}')
+    while True:
+        for file in sorted(f for f in listdir(queue_path) if f.endswith('.json')):
+            processing_path = os_path.join(folders['processing'], file)
+            try:
+                replace(os_path.join(queue_path, file), processing_path)
+            except FileNotFoundError:
+                continue  # removed meanwhile
+            try:
+                try:
+                    tasks = _read_json(processing_path)
+                except ValueError as ex:
+                    tasks, results = None, [{'status': 'failed', 'error': f'Invalid task file: {ex}'}]
+                else:
+                    results = run_tasks(tasks, state)
+                _finish_task_file(folders, file, tasks, results)
+            except Exception as ex:
+                # one broken task file must not stop the daemon
+                logger.exception(ex)
+                try:
+                    replace(processing_path, os_path.join(folders['failed'], file))
+                except OSError:
+                    pass
+            if metrics_path:
+                try:
+                    with open(metrics_path, 'w', encoding='utf-8') as f:
+                        f.write(metrics.prometheus_text())
+                except OSError as ex:
+                    logger.warning(f'Metrics are not written to {metrics_path}: {ex!r}')
+        if once:
+            return
+        sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ms-admin', description='MS Windows servers and services admin tasks')
+    parser.add_argument('--config', help='JSON configuration file')
+    parser.add_argument('--metrics', metavar='PATH', help='enable metrics and write them in Prometheus text format')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the tasks from the file and exit')
+    run_parser.add_argument('tasks_file')
+    daemon_parser = commands.add_parser('daemon', help='keep running and take tasks from the queue folder')
+    daemon_parser.add_argument('--queue', required=True, help='queue folder with *.json task files')
+    daemon_parser.add_argument('--interval', type=float, default=1.0, help='queue polling interval, seconds')
+    args = parser.parse_args(argv)
+
+    basicConfig(level=INFO, format='%(asctime)s %(levelname)s %(message)s')
+    config = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    if args.metrics:
+        metrics.enable()
+    state = AdminState(config)
+
+    if args.command == 'run':
+        with open(args.tasks_file, 'r', encoding='utf-8') as f:
+            results = run_tasks(json.load(f), state)
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=4, default=str)
+        if args.metrics:
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(metrics.prometheus_text())
+        return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+    try:
+        serve_queue(args.queue, state, args.interval, metrics_path=args.metrics)
+    except QueueLocked as ex:
+        logger.error(ex)
+        return 1
+    except KeyboardInterrupt:
+        logger.info('Stopped')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,16 @@
+import json
 from datetime import date
+from logging import getLogger
+from os import scandir, link, makedirs, rename, replace, path as os_path
+from shutil import copy2, rmtree
+from threading import Lock
+from time import perf_counter
+from typing import List, Tuple
 
-from ms_admin_utils.file_wrapper import join_paths, get_folders_list, get_modify_dt
+from ms_admin_utils import metrics
+from ms_admin_utils.file_wrapper import join_paths, get_folders_list, get_modify_dt, file_stat, walk_folders
+
+logger = getLogger('logger')
 
 
 class ClickonceConfig:
@@ -17,10 +27,85 @@ def configure(**kwargs):
     conf = ClickonceConfig(**kwargs)
 
 
-def _walk_clickonce_versions(app_path: str) -> (str, date):
+# suffix of the version folder while publish() builds it
+_PUBLISHING_SUFFIX = '.publishing'
+
+
+def _walk_clickonce_versions(app_path: str) -> (str, date, str):
     for app in get_folders_list(app_path):
+        if app.endswith(_PUBLISHING_SUFFIX):
+            continue
         version_number = '.'.join(app.split('_')[1:])
-        yield version_number, get_modify_dt(join_paths(app_path, app), False)
+        yield version_number, get_modify_dt(join_paths(app_path, app), False), app
+
+
+def _entry_mtime(entry) -> float:
+    if not metrics.enabled:
+        return entry.stat().st_mtime
+    with metrics.timed('file.stat'):
+        return entry.stat().st_mtime
+
+
+def _scan_clickonce_versions(app_path: str) -> List[Tuple[str, date, str]]:
+    with metrics.timed('clickonce.scan_app') as timer:
+        with scandir(app_path) as entries:
+            versions = [('.'.join(e.name.split('_')[1:]), date.fromtimestamp(_entry_mtime(e)), e.name)
+                        for e in entries if e.is_dir() and not e.name.endswith(_PUBLISHING_SUFFIX)]
+        timer.value = len(versions)
+    return versions
+
+
+def _version_folder(prefix: str, version_number: str) -> str:
+    return f'{prefix}_{version_number.replace(".", "_")}'
+
+
+def _file_hash(path: str, chunk_size: int = 1024 * 1024) -> bytes:
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def _is_same_file(path: str, size: int, other_path: str) -> bool:
+    try:
+        if file_stat(other_path).st_size != size:
+            return False
+    except FileNotFoundError:
+        return False
+    return _file_hash(path) == _file_hash(other_path)
+
+
+class PublishResult:
+    """
+    Publish report: files hardlinked from the previous version and copied from the source
+    """
+    def __init__(self, version_name: str, version_path: str):
+        self.version_name = version_name
+        self.version_path = version_path
+        self.files_linked = 0
+        self.files_copied = 0
+        self.bytes_saved = 0
+        self.bytes_copied = 0
+        self.duration = 0.0
+
+    def __repr__(self):
+        return f'PublishResult({self.version_name}: linked={self.files_linked} ({self.bytes_saved} bytes saved), ' \
+               f'copied={self.files_copied} ({self.bytes_copied} bytes), {self.duration:.2f}s)'
+
+
+class RetentionResult:
+    """
+    Retention report: removed versions and freed bytes (files still hardlinked from other versions are not counted)
+    """
+    def __init__(self):
+        self.removed: List[str] = []
+        self.bytes_freed = 0
+        self.duration = 0.0
+
+    def __repr__(self):
+        return f'RetentionResult(removed={len(self.removed)}, {self.bytes_freed} bytes freed, {self.duration:.2f}s)'
 
 
 def _get_next_version_name(version_name):
@@ -42,6 +127,7 @@ class ClickonceApplication:
         self.folder = kwargs.pop('folder')
         self.is_beta = kwargs.pop('is_beta', False)
         self.prefix = kwargs.pop('prefix')
+        self.index: ClickonceIndex = kwargs.pop('index', None)
         self.versions: {ClickonceVersion} = {}
         self.__last_version_name = ''
         self.load_versions()
@@ -50,14 +136,108 @@ class ClickonceApplication:
 
     def load_versions(self):
         app_path = join_paths(conf.root_path, self.folder, conf.app_folder)
-        for v, d in _walk_clickonce_versions(app_path):
-            cov = ClickonceVersion(self, v, d)
-            self.versions[cov.name] = cov
-            if self.last_version:
-                if cov.publish_date > self.last_version.publish_date:
+        with metrics.timed('clickonce.load_versions') as timer:
+            versions = self.index.versions(self.folder) if self.index else _walk_clickonce_versions(app_path)
+            for v, d, folder in versions:
+                cov = ClickonceVersion(self, v, d, folder)
+                self.versions[cov.name] = cov
+                if self.last_version:
+                    if cov.publish_date > self.last_version.publish_date:
+                        self.__last_version_name = cov.name
+                else:
                     self.__last_version_name = cov.name
-            else:
-                self.__last_version_name = cov.name
+            timer.value = len(self.versions)
+
+    def publish(self, source_path: str) -> PublishResult:
+        """
+        Create the next version folder from the source folder. Files with the same size and hash
+        as in the last version are hardlinked to the last version, only changed files are copied
+        """
+        start = perf_counter()
+        app_path = join_paths(conf.root_path, self.folder, conf.app_folder)
+        last_path = join_paths(app_path, self.last_version.folder)
+        version_number = _get_next_version_name(self.last_version.version_number)
+        # the folder prefix on disk can differ from the configured display prefix
+        version_folder = _version_folder(self.last_version.folder.split('_')[0], version_number)
+        version_path = join_paths(app_path, version_folder)
+        if os_path.exists(version_path):
+            raise FileExistsError(f'Version folder {version_path} already exists')
+        # the version is built in a sibling folder and renamed when complete,
+        # a failed or interrupted publish leaves no half-built version behind
+        build_path = version_path + _PUBLISHING_SUFFIX
+        if os_path.exists(build_path):
+            rmtree(build_path)
+
+        result = PublishResult(self.next_version_name, version_path)
+        try:
+            with metrics.timed('clickonce.publish') as timer:
+                self.__build_version(source_path, last_path, build_path, result)
+                timer.value = result.bytes_copied
+            rename(build_path, version_path)
+        except BaseException:
+            rmtree(build_path, ignore_errors=True)
+            raise
+
+        cov = ClickonceVersion(self, version_number, date.today(), version_folder)
+        self.versions[cov.name] = cov
+        self.__last_version_name = cov.name
+        self.next_version_name = _get_next_version_name(cov.name)
+        self.next_start_date = cov.publish_date
+        result.duration = perf_counter() - start
+        return result
+
+    @staticmethod
+    def __build_version(source_path: str, last_path: str, build_path: str, result: PublishResult):
+        for root, dirs, files in walk_folders(source_path):
+            rel_root = os_path.relpath(root, source_path)
+            target_root = build_path if rel_root == '.' else join_paths(build_path, rel_root)
+            makedirs(target_root, exist_ok=True)
+            for file in files:
+                src = join_paths(root, file)
+                size = file_stat(src).st_size
+                target = join_paths(target_root, file)
+                last_file = join_paths(last_path, file) if rel_root == '.' else join_paths(last_path, rel_root, file)
+                if _is_same_file(src, size, last_file):
+                    try:
+                        link(last_file, target)
+                        result.files_linked += 1
+                        result.bytes_saved += size
+                        continue
+                    except OSError:
+                        pass  # the file system does not support hardlinks, copy the file
+                copy2(src, target)
+                result.files_copied += 1
+                result.bytes_copied += size
+
+    def prune_versions(self, keep_last: int = None, keep_since: date = None) -> RetentionResult:
+        """
+        Remove old version folders: keep the last N versions and/or the versions published since the date.
+        The last version is always kept
+        """
+        start = perf_counter()
+        result = RetentionResult()
+        app_path = join_paths(conf.root_path, self.folder, conf.app_folder)
+        versions = sorted(self.versions.values(), key=lambda v: v.publish_date, reverse=True)
+        for i, v in enumerate(versions):
+            if v is self.last_version:
+                continue
+            if keep_last is not None and i < keep_last:
+                continue
+            if keep_since and v.publish_date >= keep_since:
+                continue
+            if keep_last is None and not keep_since:
+                continue
+            version_path = join_paths(app_path, v.folder)
+            for root, dirs, files in walk_folders(version_path):
+                for file in files:
+                    st = file_stat(join_paths(root, file))
+                    if st.st_nlink == 1:
+                        result.bytes_freed += st.st_size
+            rmtree(version_path)
+            del self.versions[v.name]
+            result.removed.append(v.name)
+        result.duration = perf_counter() - start
+        return result
 
 
 class ClickonceVersion:
@@ -65,7 +245,137 @@ class ClickonceVersion:
     def name(self):
         return f'{self.__app.prefix}_{self.version_number}{".beta" if self.__app.is_beta else ""}'
 
-    def __init__(self, app: ClickonceApplication, version_number: str, publish_date: date):
+    def __init__(self, app: ClickonceApplication, version_number: str, publish_date: date, folder: str = None):
         self.__app = app
         self.version_number = version_number
         self.publish_date = publish_date
+        # the real folder name on disk, the configured prefix is used for the display name only
+        self.folder = folder or _version_folder(app.prefix, version_number)
+
+
+class ClickonceIndex:
+    """
+    In-memory index of the versions of all applications under conf.root_path.
+    refresh() scans the application folders concurrently and rescans only the folders
+    whose mtime or the mtime of the last version folder changed since the last refresh or the loaded snapshot.
+    A changed mtime of an older version folder (e.g. files copied into it later) is not noticed
+    until the application folder changes, its publish date in the index stays as scanned
+    """
+    def __init__(self, snapshot_path: str = None, max_workers: int = 8):
+        self.snapshot_path = snapshot_path
+        self.max_workers = max_workers
+        # folder -> {'mtime': float, 'versions': [(version_number, publish_date, folder)], 'last': int,
+        #            'last_mtime': float}
+        self.apps = {}
+        self.__lock = Lock()
+        if snapshot_path and os_path.exists(snapshot_path):
+            self.load()
+
+    def load(self):
+        """Load the snapshot, an unreadable or foreign snapshot is ignored and the next refresh rescans everything"""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('root_path') != conf.root_path or snapshot.get('app_folder') != conf.app_folder:
+                return
+            apps = {folder: {'mtime': app['mtime'],
+                             'versions': [(v, date.fromisoformat(d), f) for v, d, f in app['versions']],
+                             'last': app['last'],
+                             'last_mtime': app['last_mtime']}
+                    for folder, app in snapshot['apps'].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as ex:
+            logger.warning(f'ClickOnce index snapshot {self.snapshot_path} is ignored: {ex!r}')
+            return
+        self.apps = apps
+
+    def save(self):
+        snapshot = {'root_path': conf.root_path,
+                    'app_folder': conf.app_folder,
+                    'apps': {folder: {'mtime': app['mtime'],
+                                      'versions': [(v, d.isoformat(), f) for v, d, f in app['versions']],
+                                      'last': app['last'],
+                                      'last_mtime': app['last_mtime']}
+                             for folder, app in self.apps.items()}}
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        replace(tmp_path, self.snapshot_path)
+
+    def __scan_app(self, folder: str, mtime: float) -> bool:
+        app_path = join_paths(conf.root_path, folder, conf.app_folder)
+        try:
+            versions = _scan_clickonce_versions(app_path)
+            last = -1
+            for i, (_, d, _) in enumerate(versions):
+                if last < 0 or d > versions[last][1]:
+                    last = i
+            last_mtime = file_stat(join_paths(app_path, versions[last][2])).st_mtime if last >= 0 else None
+        except OSError as ex:
+            # removed or not readable since refresh() listed it
+            logger.warning(f'ClickOnce application {folder} is dropped from the index: {ex!r}')
+            with self.__lock:
+                self.apps.pop(folder, None)
+            return False
+        with self.__lock:
+            self.apps[folder] = {'mtime': mtime, 'versions': versions, 'last': last, 'last_mtime': last_mtime}
+        return True
+
+    def __is_changed(self, app_path: str, app: dict, mtime: float) -> bool:
+        if not app or app['mtime'] != mtime:
+            return True
+        if app['last'] < 0:
+            return False
+        try:
+            # files written into the last version folder do not change the application folder mtime
+            return file_stat(join_paths(app_path, app['versions'][app['last']][2])).st_mtime != app['last_mtime']
+        except OSError:
+            return True
+
+    def refresh(self) -> List[str]:
+        """Rescan the changed application folders, returns the list of rescanned folders"""
+        changed = []
+        current = set()
+        with scandir(conf.root_path) as entries:
+            for e in entries:
+                if not e.is_dir():
+                    continue
+                app_path = join_paths(e.path, conf.app_folder)
+                try:
+                    mtime = file_stat(app_path).st_mtime
+                except FileNotFoundError:
+                    continue  # not an application folder
+                except OSError as ex:
+                    logger.warning(f'ClickOnce application {e.name} is skipped: {ex!r}')
+                    continue
+                current.add(e.name)
+                if self.__is_changed(app_path, self.apps.get(e.name), mtime):
+                    changed.append((e.name, mtime))
+        removed = set(self.apps) - current
+        for folder in removed:
+            del self.apps[folder]
+        scanned = []
+        if changed:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                done = list(executor.map(lambda a: self.__scan_app(*a), changed))
+            scanned = [folder for (folder, _), ok in zip(changed, done) if ok]
+        if self.snapshot_path and (changed or removed):
+            self.save()
+        return scanned
+
+    def versions(self, folder: str) -> List[Tuple[str, date, str]]:
+        app = self.apps.get(folder)
+        return list(app['versions']) if app else []
+
+    def last_version(self, folder: str) -> Tuple[str, date, str]:
+        app = self.apps.get(folder)
+        if app and app['last'] >= 0:
+            return app['versions'][app['last']]
+
+    def next_version_number(self, folder: str) -> str:
+        last = self.last_version(folder)
+        if last:
+            return _get_next_version_name(last[0])
+
+    def versions_since(self, folder: str, since: date) -> List[Tuple[str, date, str]]:
+        return sorted((v for v in self.versions(folder) if v[1] >= since), key=lambda v: v[1])
@@ -2,17 +2,29 @@ import json
 import os
 import re
 from datetime import date, datetime, timedelta
+from logging import getLogger
 from os import path as os_path, sep, listdir, walk, stat, makedirs
 from re import compile as re_compile
+from time import perf_counter
 from shutil import copy2, make_archive
-from typing import Union, List
-from zipfile import ZipFile, ZIP_DEFLATED
+from typing import Callable, Union, List
+
+from ms_admin_utils import metrics
+
+logger = getLogger('logger')
 
 
 class UnsupportedBackupTask(Exception):
     pass
 
 
+class BackupTaskFailed(Exception):
+    """results: the results of all backups, including the successful ones"""
+    def __init__(self, message: str, results: list = None):
+        super().__init__(message)
+        self.results = results
+
+
 def computer_name():
     return os.environ['COMPUTERNAME']
 
@@ -64,9 +76,35 @@ def split_file_name(file_name: str) -> (str, str):
     return file_name, ext[1:]
 
 
+def file_stat(path: str):
+    """os.stat, timed as file.stat when the metrics are enabled"""
+    if not metrics.enabled:
+        return stat(path)
+    with metrics.timed('file.stat'):
+        return stat(path)
+
+
+def walk_folders(root_path: str):
+    """os.walk, every folder listing is timed as file.walk_dir (value - files) when the metrics are enabled"""
+    if not metrics.enabled:
+        yield from walk(root_path)
+        return
+    walker = walk(root_path)
+    while True:
+        start = perf_counter()
+        entry = next(walker, None)
+        if entry is None:
+            return
+        metrics.record('file.walk_dir', perf_counter() - start, len(entry[2]))
+        yield entry
+
+
 def get_modify_dt(path: str, with_time: bool = True) -> Union[datetime, date]:
-    if path and os_path.exists(path):
-        mtime = os_path.getmtime(path)
+    if path:
+        try:
+            mtime = file_stat(path).st_mtime
+        except OSError:
+            return None
         mdt = datetime.fromtimestamp(mtime)
         return mdt if with_time else mdt.date()
 
@@ -102,7 +140,7 @@ def walk_through_files(root_path: str,
                        only_top: bool = False,
                        re_pattern: str = None):
     exclusions = exclusions if exclusions else []
-    for root, dirs, files in walk(root_path):
+    for root, dirs, files in walk_folders(root_path):
         for file in files:
             file_name = os_path.split(file)[1]
             ext = os_path.splitext(file_name)[1]
@@ -177,11 +215,17 @@ def zip_backup(source, target, freq, file_format, base_name = '', freq_unit = 'd
     if not bo_modify_dt or bo_modify_dt < datetime.today() - delta:
         if os_path.exists(source):
             bo_base_name = bo_base_name + f'_{datetime.today():%Y-%m-%d-%H-%M}'
-            if os_path.isdir(source):
-                make_archive(join_paths(target, bo_base_name), file_format, source)
-            else:
-                zip_path = join_paths(target, bo_base_name + '.' + file_format)
-                ZipFile(zip_path, 'w', ZIP_DEFLATED).write(source, os_path.basename(source))
+            from zipfile import ZipFile, ZIP_DEFLATED  # imported on demand, see ms_admin_utils/__init__.py
+            with metrics.timed('file.archive') as timer:
+                if os_path.isdir(source):
+                    zip_path = make_archive(join_paths(target, bo_base_name), file_format, source)
+                else:
+                    zip_path = join_paths(target, bo_base_name + '.' + file_format)
+                    with ZipFile(zip_path, 'w', ZIP_DEFLATED) as zf:
+                        zf.write(source, os_path.basename(source))
+                if metrics.enabled:
+                    timer.value = stat(zip_path).st_size
+            return zip_path
 
 
 def file_exists(folder: str = None,
@@ -203,7 +247,7 @@ def folder_create(folder: str):
 
 def get_file_size(folder: str, file_name: str) -> int:
     file_path = join_paths(folder, file_name)
-    return stat(file_path).st_size
+    return file_stat(file_path).st_size
 
 
 def save_as_json(data, folder_path: str, file_name: str, data_cls = None):
@@ -214,18 +258,58 @@ def save_as_json(data, folder_path: str, file_name: str, data_cls = None):
         json.dump(data, f, ensure_ascii=False, indent=4, cls=data_cls)
 
 
-def backup(backup_tasks: List):
-    for task in backup_tasks:
-        if task['type'] == 'zip':
-            zip_backup(source=task['source'], 
-                       target=task['target'], 
-                       freq=task['freq'],
-                       freq_unit=task['freq_unit'],
-                       file_format=task['file_format'],
-                       base_name=task.get('base_name', ''), 
-                       arch_depth=task.get('arch_depth', {}))
-        else:
-            raise UnsupportedBackupTask(task)
+def backup(backup_tasks: List, get_dbs: Callable = None) -> list:
+    """
+    Run all the tasks and return their results: the archive path (None if not due) for 'zip' tasks,
+    the list of sql_wrapper.BackupResult for 'sql' tasks. A failed task does not stop the next ones,
+    BackupTaskFailed with all the results is raised at the end.
+    get_dbs(server) returns the database list of the server for 'sql' tasks (e.g. cached by the daemon),
+    sql_wrapper.get_dbs by default
+    """
+    results = []
+    errors = []
+    for i, task in enumerate(backup_tasks):
+        try:
+            results.append(_run_backup_task(task, get_dbs))
+        except BackupTaskFailed as ex:
+            results.append(ex.results)
+            errors.append(f'task {i}: {ex}')
+        except Exception as ex:
+            logger.exception(ex)
+            results.append(None)
+            errors.append(f'task {i}: {ex!r}')
+    if errors:
+        raise BackupTaskFailed('; '.join(errors), results)
+    return results
+
+
+def _run_backup_task(task: dict, get_dbs: Callable = None):
+    if task['type'] == 'zip':
+        return zip_backup(source=task['source'],
+                          target=task['target'],
+                          freq=task['freq'],
+                          freq_unit=task['freq_unit'],
+                          file_format=task['file_format'],
+                          base_name=task.get('base_name', ''),
+                          arch_depth=task.get('arch_depth', {}))
+    elif task['type'] == 'sql':
+        from ms_admin_utils.sql_wrapper import sql_backup
+        return sql_backup(server=task['server'],
+                          target=task['target'],
+                          freq=task['freq'],
+                          freq_unit=task.get('freq_unit', 'day'),
+                          backup_type=task.get('backup_type', 'full'),
+                          dbs=task.get('dbs'),
+                          max_workers=task.get('max_workers', 2),
+                          journal_path=task.get('journal_path'),
+                          databases=get_dbs(task['server']) if get_dbs and task.get('dbs') is None else None,
+                          compression=task.get('compression'),
+                          checksum=task.get('checksum', True),
+                          copy_only=task.get('copy_only', False),
+                          buffer_count=task.get('buffer_count'),
+                          max_transfer_size=task.get('max_transfer_size'))
+    else:
+        raise UnsupportedBackupTask(task)
 
 
 def write_to_file(path: str, content: str):
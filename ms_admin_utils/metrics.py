@@ -0,0 +1,142 @@
+"""
+Lightweight instrumentation of the hot paths: connection opens, query executes and fetches,
+directories walked, files stat'ed, archive bytes written.
+
+Disabled by default (or enabled with the MS_ADMIN_METRICS=1 environment variable),
+a disabled metric costs one attribute check at the call site.
+
+    metrics.enable()
+    metrics.add_hook(lambda name, seconds, value: ...)
+    ...
+    print(metrics.summary())
+    write('metrics.prom', metrics.prometheus_text())
+"""
+import os
+from logging import getLogger
+from re import sub
+from threading import Lock
+from time import perf_counter
+from typing import Callable
+
+logger = getLogger('logger')
+enabled = os.environ.get('MS_ADMIN_METRICS', '') not in ('', '0')
+
+_lock = Lock()
+_hooks = []
+_stats = {}  # name -> [count, seconds, value, max seconds]
+
+
+class _Timer:
+    __slots__ = ('name', 'value', 'start')
+
+    def __init__(self, name: str, value: int = None):
+        self.name = name
+        self.value = value
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        record(self.name, perf_counter() - self.start, self.value)
+
+
+class _NullTimer:
+    __slots__ = ('value',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def add_hook(callback: Callable):
+    """The callback gets (name, seconds, value) for every recorded event, seconds and value can be None"""
+    _hooks.append(callback)
+
+
+def remove_hook(callback: Callable):
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+def record(name: str, seconds: float = None, value: int = None):
+    if not enabled:
+        return
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = [0, 0.0, 0, 0.0]
+        stat[0] += 1
+        if seconds is not None:
+            stat[1] += seconds
+            if seconds > stat[3]:
+                stat[3] = seconds
+        if value is not None:
+            stat[2] += value
+    for hook in _hooks:
+        try:
+            hook(name, seconds, value)
+        except Exception as ex:
+            # a failing hook (e.g. a push to a dashboard) must not break the instrumented operation
+            logger.warning(f'Metrics hook {hook!r} failed for {name}: {ex!r}')
+
+
+def count(name: str, value: int = None):
+    if enabled:
+        record(name, None, value)
+
+
+def timed(name: str, value: int = None):
+    """Context manager timing the block, value (e.g. number of rows) can be set on the timer inside the block"""
+    return _Timer(name, value) if enabled else _NULL_TIMER
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {name: {'count': s[0], 'seconds': s[1], 'value': s[2], 'max_seconds': s[3]}
+                for name, s in sorted(_stats.items())}
+
+
+def summary() -> str:
+    lines = [f"{'metric':<32}{'count':>10}{'seconds':>12}{'avg ms':>10}{'max ms':>10}{'value':>14}"]
+    for name, s in snapshot().items():
+        avg = s['seconds'] / s['count'] * 1000 if s['count'] else 0
+        lines.append(f"{name:<32}{s['count']:>10}{s['seconds']:>12.3f}{avg:>10.2f}"
+                     f"{s['max_seconds'] * 1000:>10.2f}{s['value']:>14}")
+    return '\n'.join(lines)
+
+
+def prometheus_text(prefix: str = 'ms_admin_utils') -> str:
+    lines = []
+    for name, s in snapshot().items():
+        metric = sub(r'[^a-zA-Z0-9_]', '_', f'{prefix}_{name}')
+        lines.append(f'# TYPE {metric}_total counter')
+        lines.append(f"{metric}_total {s['count']}")
+        if s['seconds']:
+            lines.append(f'# TYPE {metric}_seconds_total counter')
+            lines.append(f"{metric}_seconds_total {s['seconds']:.6f}")
+        if s['value']:
+            lines.append(f'# TYPE {metric}_value_total counter')
+            lines.append(f"{metric}_value_total {s['value']}")
+    return '\n'.join(lines) + '\n'
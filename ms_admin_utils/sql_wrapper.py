@@ -1,11 +1,20 @@
+import csv
+import json
+from array import array
+from collections import namedtuple
+from datetime import date, datetime, time
+from decimal import Decimal
 from enum import Enum
+from itertools import chain
 from logging import getLogger
+from os import replace, path as os_path
 from re import match
-from typing import List
+from sys import intern, modules
+from time import perf_counter
+from typing import List, Iterable, Union
 
-from pyodbc import connect as odbc_connect, DataError, ProgrammingError, OperationalError
-
-from ms_admin_utils.file_wrapper import walk_through_files
+from ms_admin_utils import metrics
+from ms_admin_utils.file_wrapper import walk_through_files, join_paths, folder_create, get_delta, BackupTaskFailed
 
 logger = getLogger('logger')
 CONNECTION_STRING = "Driver={0};Server={1};Database={2};Trusted_Connection=yes;"
@@ -16,6 +25,10 @@ class SqlConfig:
         self.driver = kwargs.pop('driver', '{ODBC Driver 17 for SQL Server}')
         self.master_db = kwargs.pop('master_db', 'master')
         self.ms_db = kwargs.pop('ms_db', 'msdb')
+        # pyodbc.connect compatible callable, can be replaced by a stand-in backend (see benchmarks/fake_odbc.py)
+        self.connector = kwargs.pop('connector', None)
+        # exception class (or tuple) raised by the connector, pyodbc.Error and its subclasses by default
+        self.errors = kwargs.pop('errors', None)
 
 
 conf = SqlConfig()
@@ -59,12 +72,15 @@ class JobSubsystem(Enum):
 
 
 class Database:
+    __slots__ = ('server', 'name', 'create_date', 'compatibility_level', 'is_read_only', 'state', 'is_in_standby',
+                 'is_cleanly_shutdown', 'recovery_model', 'is_fulltext_enabled', 'is_master_key_encrypted_by_server',
+                 'is_broker_enabled', 'is_encrypted', 'recovery_mode', 'status', 'user_access')
+
     def __init__(self, data_row):
         self.server = data_row.server
         self.name = data_row.name
         self.create_date = data_row.create_date
         self.compatibility_level = data_row.compatibility_level
-        self.user_access = data_row.user_access_desc
         self.is_read_only = data_row.is_read_only
         self.state = data_row.state_desc
         self.is_in_standby = data_row.is_in_standby
@@ -78,35 +94,191 @@ class Database:
         self.status = data_row.status
         self.user_access = data_row.user_access
 
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        database = cls.__new__(cls)
+        for k in cls.__slots__:
+            setattr(database, k, data.get(k))
+        return database
+
+
+class Column:
+    """
+    Column metadata from sys.columns (see get_columns)
+    """
+    __slots__ = ('name', 'type', 'max_length', 'precision', 'scale', 'is_nullable', 'is_identity', 'is_computed')
+
+    def __init__(self, data_row):
+        self.name = data_row.name
+        self.type = data_row.type
+        self.max_length = data_row.max_length
+        self.precision = data_row.precision
+        self.scale = data_row.scale
+        self.is_nullable = data_row.is_nullable
+        self.is_identity = data_row.is_identity
+        self.is_computed = data_row.is_computed
+
+    @property
+    def is_generated(self) -> bool:
+        """The value is generated by the server: computed or rowversion (timestamp) column"""
+        return bool(self.is_computed) or self.type == 'timestamp'
+
+    def __repr__(self):
+        return f'Column({self.name} {get_simple_type(self)}{"" if self.is_nullable else " not null"})'
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        column = cls.__new__(cls)
+        for k in cls.__slots__:
+            setattr(column, k, data.get(k))
+        return column
+
+
+# Array type codes for not nullable columns by python type from cursor.description
+# (bit columns stay in lists, an array would return them as 1/0 instead of True/False)
+_ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+
+class ColumnarResult:
+    """
+    Column-oriented query result: every column is stored in a compact array
+    (numbers of not nullable columns) or in a list of interned strings/objects
+    """
+    __slots__ = ('columns', 'data', '__row_type')
+
+    def __init__(self, columns: List[str], data: List[Union[array, list]]):
+        self.columns = tuple(columns)
+        self.data = data
+        self.__row_type = None
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def __iter__(self):
+        return self.rows()
+
+    def __getitem__(self, column: str) -> Union[array, list]:
+        return self.data[self.columns.index(column)]
+
+    def rows(self):
+        """Rows as named tuples, the attribute access is the same as for pyodbc rows"""
+        if not self.__row_type:
+            self.__row_type = namedtuple('Row', self.columns, rename=True)
+        row_type = self.__row_type
+        for values in zip(*self.data):
+            yield row_type._make(values)
+
+    def to_rows(self) -> List[tuple]:
+        return list(zip(*self.data))
+
+    def group(self, key: str, value: str) -> dict:
+        """Group values of the column by the key column: {key: [value, ...]}"""
+        groups = {}
+        for k, v in zip(self[key], self[value]):
+            if k in groups:
+                groups[k].append(v)
+            else:
+                groups[k] = [v]
+        return groups
+
+    def append(self, row):
+        for i, v in enumerate(row):
+            store = self.data[i]
+            if isinstance(store, array):
+                try:
+                    store.append(v)
+                    continue
+                except (TypeError, OverflowError):
+                    store = self.data[i] = list(store)
+            store.append(intern(v) if isinstance(v, str) else v)
+
+    @classmethod
+    def from_description(cls, description):
+        data = []
+        for _, type_code, _, _, _, _, null_ok in description:
+            typecode = None if null_ok else _ARRAY_TYPECODES.get(type_code)
+            data.append(array(typecode) if typecode else [])
+        return cls([d[0] for d in description], data)
+
+    @classmethod
+    def from_rows(cls, columns: List[str], rows: Iterable):
+        result = cls(columns, [[] for _ in columns])
+        for row in rows:
+            result.append(row)
+        return result
+
 
 def __parse_db_path(db_path):
     server, db = db_path.split('.')
     return server, db
 
 
+def odbc_connect(*args, **kwargs):
+    """pyodbc is imported on the first connection, so file-only tasks do not load the ODBC driver manager"""
+    from pyodbc import connect
+    return connect(*args, **kwargs)
+
+
+def _odbc_errors(*names):
+    """
+    Exception classes for except clauses: conf.errors of the configured connector,
+    otherwise the pyodbc classes by name (nothing to catch if pyodbc has not been imported)
+    """
+    if conf.errors is not None:
+        return conf.errors
+    pyodbc = modules.get('pyodbc')
+    return tuple(getattr(pyodbc, name) for name in names) if pyodbc else ()
+
+
+def _connect(server: str, db: str, **kwargs):
+    connector = conf.connector or odbc_connect
+    with metrics.timed('sql.connect'):
+        return connector(Driver=conf.driver,
+                         Server=server,
+                         Database=db,
+                         Trusted_Connection='yes',
+                         **kwargs)
+
+
+def _execute(cursor, sql_query: str, *params):
+    with metrics.timed('sql.execute'):
+        return cursor.execute(sql_query, *params)
+
+
 def execute_wo_transaction(sql_queries: [str], server: str, db: str):
-    with odbc_connect(Driver=conf.driver,
-                      Server=server,
-                      Database=db,
-                      Trusted_Connection='yes',
-                      autocommit=True,
-                      timeout=600) as conn:
+    with _connect(server, db, autocommit=True, timeout=600) as conn:
         cursor = conn.cursor()
         for sql_query in sql_queries:
             logger.debug('Execute query:\n' + sql_query)
-            cursor.execute(sql_query)
-            while cursor.nextset():
-                pass
+            with metrics.timed('sql.execute'):
+                cursor.execute(sql_query)
+                while cursor.nextset():
+                    pass
 
 
-def sql_select(sql_query: str, server: str, db: str):
-    with odbc_connect(Driver=conf.driver,
-                      Server=server,
-                      Database=db,
-                      Trusted_Connection='yes') as conn:
+def sql_select(sql_query: str, server: str, db: str, columnar: bool = False, fetch_size: int = 10000):
+    with _connect(server, db) as conn:
         cursor = conn.cursor()
-        cursor.execute(sql_query)
-        return cursor.fetchall()
+        _execute(cursor, sql_query)
+        with metrics.timed('sql.fetch') as timer:
+            if not columnar:
+                rows = cursor.fetchall()
+                timer.value = len(rows)
+                return rows
+            result = ColumnarResult.from_description(cursor.description)
+            rows = cursor.fetchmany(fetch_size)
+            while rows:
+                for row in rows:
+                    result.append(row)
+                rows = cursor.fetchmany(fetch_size)
+            timer.value = len(result)
+            return result
 
 
 def sql_select_1st_row(sql_query: str, server: str, db: str):
@@ -117,20 +289,17 @@ def sql_select_1st_row(sql_query: str, server: str, db: str):
 def sql_update(sql_query, server, db, expected_result=True):
     if not sql_query:
         return
-    with odbc_connect(Driver=conf.driver,
-                      Server=server,
-                      Database=db,
-                      Trusted_Connection='yes') as conn:
+    with _connect(server, db) as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute(sql_query)
+            _execute(cursor, sql_query)
             if expected_result:
                 result = cursor.fetchone()
                 if result.RESULT != "OK":
                     logger.error(result.RESULT)
                     logger.info(sql_query)
                     return result.RESULT
-        except (DataError, ProgrammingError, OperationalError) as ex:
+        except _odbc_errors('DataError', 'ProgrammingError', 'OperationalError') as ex:
             logger.info(sql_query)
             logger.exception(ex)
             return ex.args[-1]
@@ -179,12 +348,19 @@ def restore_db(server: str,
                set_single_user: bool = True,
                set_multi_user: bool = True,
                post_scripts_folder: str = None,
-               trancate: bool = False):
+               trancate: bool = False,
+               databases: List[Database] = None):
+    """
+    databases: the database list of the server (e.g. cached by a long-running process), get_db by default
+    """
     queries = []
     restore_query = ""
     modify_file = ""
 
-    database = get_db(server, db)
+    if databases is None:
+        database = get_db(server, db)
+    else:
+        database = next((d for d in databases if d.name == db), None)
     
     if set_single_user and database:
         queries.append(f"alter database [{db}] set single_user with rollback immediate;\n")
@@ -223,6 +399,176 @@ def restore_db(server: str,
     logger.info(f'Finish all actions to restore {server}.{db}')
 
 
+# backup type -> (backup statement, msdb.dbo.backupset.type, file extension)
+BACKUP_TYPES = {'full': ('database', 'D', 'bak'),
+                'diff': ('database', 'I', 'bak'),
+                'log': ('log', 'L', 'trn')}
+
+
+class BackupResult:
+    """
+    Backup report of one database: stripe files, size on disk (from msdb backupset), duration and throughput
+    """
+    def __init__(self, server: str, db: str, backup_type: str, files: List[str]):
+        self.server = server
+        self.db = db
+        self.backup_type = backup_type
+        self.files = files
+        self.finished: datetime = None
+        self.size = 0
+        self.duration = 0.0
+        self.error = None
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.size / 2 ** 20 / self.duration if self.duration else 0.0
+
+    def to_dict(self) -> dict:
+        return {'server': self.server, 'db': self.db, 'backup_type': self.backup_type, 'files': self.files,
+                'finished': self.finished.isoformat() if self.finished else None, 'size': self.size,
+                'duration': round(self.duration, 3), 'mb_per_sec': round(self.mb_per_sec, 3), 'error': self.error}
+
+    def __repr__(self):
+        return f'BackupResult({self.server}.{self.db} {self.backup_type}: ' + \
+               (f'failed: {self.error})' if self.error else
+                f'{self.size / 2 ** 20:.1f} MB, {self.duration:.1f}s, {self.mb_per_sec:.1f} MB/s)')
+
+
+def backup_db(server: str,
+              db: str,
+              target_folders: List[str],
+              backup_type: str = 'full',
+              compression: bool = None,
+              buffer_count: int = None,
+              max_transfer_size: int = None,
+              copy_only: bool = False,
+              checksum: bool = True) -> BackupResult:
+    """
+    BACKUP DATABASE/LOG striped across the target folders (one file per folder).
+    compression None keeps the server default (backup compression is not available in the Express edition)
+    """
+    statement, set_type, ext = BACKUP_TYPES[backup_type]
+    stamp = f'{datetime.now():%Y%m%d_%H%M%S}'
+    files = [join_paths(folder, f'{db}_{backup_type.upper()}_{stamp}_{i}of{len(target_folders)}.{ext}')
+             for i, folder in enumerate(target_folders, 1)]
+    options = ['init', 'format', 'stats = 10']
+    if compression is not None:
+        options.append('compression' if compression else 'no_compression')
+    if backup_type == 'diff':
+        options.append('differential')
+    if checksum:
+        options.append('checksum')
+    if copy_only:
+        options.append('copy_only')
+    if buffer_count:
+        options.append(f'buffercount = {buffer_count}')
+    if max_transfer_size:
+        options.append(f'maxtransfersize = {max_transfer_size}')
+    query = f"backup {statement} [{db}] to " + ", ".join(f"disk = N'{f}'" for f in files) + \
+            f" with {', '.join(options)}"
+
+    result = BackupResult(server, db, backup_type, files)
+    logger.info(f'Start {backup_type} backup of {server}.{db}')
+    start = perf_counter()
+    with metrics.timed('sql.backup') as timer:
+        execute_wo_transaction([query], server, conf.master_db)
+        result.duration = perf_counter() - start
+        result.finished = datetime.now()
+        row = sql_select_1st_row(f"select top 1 compressed_backup_size as size "
+                                 f"from dbo.backupset "
+                                 f"where database_name = '{db}' and type = '{set_type}' "
+                                 f"order by backup_finish_date desc", server, conf.ms_db)
+        result.size = int(row.size) if row and row.size else 0
+        timer.value = result.size
+    logger.info(f'Finish {backup_type} backup of {server}.{db}: {result}')
+    return result
+
+
+def backup_dbs(server: str,
+               dbs: List[str],
+               target_folders: List[str],
+               max_workers: int = 2,
+               **backup_options) -> List[BackupResult]:
+    """
+    Back up the databases concurrently, at most max_workers backups run on the server at once.
+    A failed backup does not stop the others, its error is kept in the result
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def backup_one(db):
+        try:
+            return backup_db(server, db, target_folders, **backup_options)
+        except Exception as ex:
+            logger.exception(ex)
+            result = BackupResult(server, db, backup_options.get('backup_type', 'full'), [])
+            result.error = str(ex.args[-1]) if ex.args else repr(ex)
+            return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(backup_one, dbs))
+
+
+def load_backup_journal(journal_path: str) -> dict:
+    if not os_path.exists(journal_path):
+        return {}
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_backup_journal(journal: dict, journal_path: str):
+    folder_create(os_path.dirname(journal_path))
+    tmp_path = journal_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False, indent=4)
+    replace(tmp_path, journal_path)
+
+
+def sql_backup(server: str,
+               target: Union[str, List[str]],
+               freq: int,
+               freq_unit: str = 'day',
+               backup_type: str = 'full',
+               dbs: List[str] = None,
+               max_workers: int = 2,
+               journal_path: str = None,
+               databases: List[Database] = None,
+               **backup_options):
+    """
+    Native SQL Server backup of the databases (all online user databases by default) striped across
+    the target folders. The results are recorded in the backup journal (backup_journal.json in the first
+    target folder by default), so the frequency check does not rescan the target folders.
+    databases: the database list of the server (e.g. cached by a long-running process), get_dbs by default
+    """
+    targets = [target] if isinstance(target, str) else list(target)
+    journal_path = journal_path or join_paths(targets[0], 'backup_journal.json')
+    journal = load_backup_journal(journal_path)
+
+    if dbs is None:
+        dbs = [d.name for d in (databases if databases is not None else get_dbs(server, None))
+               if d.state == 'ONLINE' and not d.is_in_standby
+               and not (backup_type == 'log' and d.recovery_model == 'SIMPLE')]
+    since = datetime.now() - get_delta(freq, freq_unit)
+    due = [db for db in dbs
+           if journal.get(f'{server}.{db}.{backup_type}', {}).get('finished', '') < since.isoformat()]
+    if not due:
+        return []
+
+    results = backup_dbs(server, due, targets, max_workers=max_workers, backup_type=backup_type, **backup_options)
+    for r in results:
+        if not r.error:
+            journal[f'{server}.{r.db}.{backup_type}'] = {'finished': r.finished.isoformat(),
+                                                         'files': r.files,
+                                                         'size': r.size,
+                                                         'duration': round(r.duration, 3),
+                                                         'mb_per_sec': round(r.mb_per_sec, 3)}
+    save_backup_journal(journal, journal_path)
+    failed = [r for r in results if r.error]
+    if failed:
+        raise BackupTaskFailed(f'{len(failed)} of {len(results)} backups failed on {server}: ' +
+                               '; '.join(f'{r.db}: {r.error}' for r in failed), results)
+    return results
+
+
 def trancate_db(server: str, db: str):
     queries = [f"DBCC SHRINKFILE (N'{db}' , 0, TRUNCATEONLY)",
                f"DBCC SHRINKFILE (N'{db}_log' , 0, TRUNCATEONLY)"]
@@ -253,7 +599,7 @@ def grant_permission(permission: str, sql_object: str, principal: str, server: s
     logger.debug(query)
 
 
-def get_table_structure(db_path):
+def get_table_structure(db_path, columnar: bool = False):
     tables = {}
     query = "select t.name as table_name, c.name as column_name " \
             "from sys.objects t " \
@@ -261,6 +607,8 @@ def get_table_structure(db_path):
             "where t.type_desc  = 'USER_TABLE' and t.name != 'sysdiagrams'" \
             "order by  t.name, c.column_id"
     server, db = __parse_db_path(db_path)
+    if columnar:
+        return sql_select(query, server, db, columnar=True)
     for row in sql_select(query, server, db):
         if row.table_name in tables:
             tables[row.table_name].append(row.column_name)
@@ -408,13 +756,14 @@ def get_views(server, db, like_filter=None):
 def get_columns(object_name, server, db):
     # First join to sys.types - trying to get system types to avoid custom user types
     # Second join to sys.types - getting the original type
-    query = "select    c.name, isnull(t.name, ut.name) as type, c.max_length, c.precision, c.scale, c.is_nullable " \
+    query = "select    c.name, isnull(t.name, ut.name) as type, c.max_length, c.precision, c.scale, c.is_nullable, " \
+            "          c.is_identity, c.is_computed " \
             "from      sys.columns c " \
             "left join sys.types t on t.user_type_id = c.system_type_id " \
             "left join sys.types ut on ut.user_type_id = c.user_type_id " \
             "where     c.object_id = object_id('" + object_name + "') " \
             "order by  c.column_id"
-    return sql_select(query, server, db)
+    return [Column(row) for row in sql_select(query, server, db)]
 
 
 def get_simple_type(column):
@@ -429,6 +778,237 @@ def get_simple_type(column):
     return column.type
 
 
+_INT_TYPES = ('bigint', 'int', 'smallint', 'tinyint')
+_DECIMAL_TYPES = ('decimal', 'numeric', 'money', 'smallmoney')
+_FLOAT_TYPES = ('float', 'real')
+_DATETIME_TYPES = ('datetime', 'datetime2', 'smalldatetime', 'datetimeoffset')
+_STR_TYPES = ('varchar', 'char', 'text', 'nvarchar', 'nchar', 'ntext', 'uniqueidentifier', 'xml', 'sysname')
+# max_length of text, ntext and uniqueidentifier is a storage size, not a number of characters
+_LIMITED_STR_TYPES = ('varchar', 'char', 'nvarchar', 'nchar')
+_TRUE_VALUES = ('1', 'true', 't', 'yes', 'y')
+_FALSE_VALUES = ('0', 'false', 'f', 'no', 'n')
+
+
+class BulkLoadResult:
+    """
+    Bulk load report: loaded rows, rejected rows (row number, row, error) and throughput
+    """
+    def __init__(self, table: str):
+        self.table = table
+        self.rows_loaded = 0
+        self.rows_read = 0
+        self.batches = 0
+        self.rejected = []
+        self.duration = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_loaded / self.duration if self.duration else 0.0
+
+    def __repr__(self):
+        return f'BulkLoadResult({self.table}: loaded={self.rows_loaded}, rejected={len(self.rejected)}, ' \
+               f'{self.duration:.2f}s, {self.rows_per_sec:.0f} rows/s)'
+
+
+def _coerce_value(value, column):
+    if value is None:
+        if not column.is_nullable:
+            raise ValueError(f'Column {column.name} does not allow nulls')
+        return None
+    if not isinstance(value, str):
+        return value
+    if column.type in _STR_TYPES:
+        if column.type in _LIMITED_STR_TYPES:
+            max_length = column.max_length // 2 if column.type in ('nvarchar', 'nchar') else column.max_length
+            if 0 < max_length < len(value):
+                raise ValueError(f'Value is too long for column {column.name} ({len(value)} > {max_length})')
+        return value
+    if value == '':
+        return _coerce_value(None, column)
+    if column.type in _INT_TYPES:
+        return int(value)
+    if column.type == 'bit':
+        if value.lower() in _TRUE_VALUES:
+            return True
+        if value.lower() in _FALSE_VALUES:
+            return False
+        raise ValueError(f'Invalid bit value "{value}" for column {column.name}')
+    if column.type in _DECIMAL_TYPES:
+        return Decimal(value)
+    if column.type in _FLOAT_TYPES:
+        return float(value)
+    if column.type == 'date':
+        return date.fromisoformat(value)
+    if column.type in _DATETIME_TYPES:
+        return datetime.fromisoformat(value)
+    if column.type == 'time':
+        return time.fromisoformat(value)
+    return value
+
+
+def read_csv_rows(path: str, delimiter: str = ',', encoding: str = 'utf-8-sig'):
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            yield row
+
+
+def read_ndjson_rows(path: str, encoding: str = 'utf-8'):
+    with open(path, 'r', encoding=encoding) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_rows(source: Union[str, Iterable], delimiter: str, encoding: str):
+    if not isinstance(source, str):
+        return iter(source)
+    ext = source.split('.')[-1].lower()
+    if ext in ('csv', 'txt'):
+        return read_csv_rows(source, delimiter, encoding)
+    if ext in ('ndjson', 'jsonl'):
+        return read_ndjson_rows(source, encoding)
+    raise ValueError(f'The source format "{ext}" does not supported')
+
+
+def _row_keys(row: dict, columns, table: str) -> List[str]:
+    """Keys of the dict rows for the columns, matched case-insensitively as SQL Server column names"""
+    keys = {str(k).lower(): k for k in row}
+    missed = [c.name for c in columns if c.name.lower() not in keys]
+    if missed:
+        raise UserWarning(f'Columns {missed} of {table} are missing in the source')
+    loaded = {c.name.lower() for c in columns}
+    unknown = [k for k in row if str(k).lower() not in loaded]
+    if unknown:
+        raise UserWarning(f'Source columns {unknown} are not loaded into {table}')
+    return [keys[c.name.lower()] for c in columns]
+
+
+def _prepare_row(row, columns, keys: List[str] = None):
+    if isinstance(row, dict):
+        if keys is None:
+            raise ValueError('Expected a sequence of values as the first row, got a dict')
+        try:
+            values = [row[k] for k in keys]
+        except KeyError as ex:
+            raise ValueError(f'Column {ex.args[0]} is missing in the row')
+        if len(row) != len(keys):
+            raise ValueError(f'Unexpected columns {[k for k in row if k not in keys]} in the row')
+        return tuple(_coerce_value(v, c) for v, c in zip(values, columns))
+    if len(row) != len(columns):
+        raise ValueError(f'Expected {len(columns)} values, got {len(row)}')
+    return tuple(_coerce_value(v, c) for v, c in zip(row, columns))
+
+
+def _reload_row_by_row(cursor, query, pending, result):
+    for row_number, row, params in pending:
+        try:
+            _execute(cursor, query, params)
+            result.rows_loaded += 1
+        except _odbc_errors('Error') as ex:
+            result.rejected.append((row_number, row, ex.args[-1]))
+
+
+def bulk_load(source: Union[str, Iterable],
+              table: str,
+              server: str,
+              db: str,
+              columns: List[str] = None,
+              batch_size: int = 1000,
+              commit_every: int = 10000,
+              delimiter: str = ',',
+              encoding: str = 'utf-8-sig',
+              identity_insert: bool = False) -> BulkLoadResult:
+    """
+    Insert rows into the table with pyodbc fast_executemany.
+    The source is an iterable of rows (dicts or sequences) or a path to a CSV (with header) or NDJSON file.
+    Dict keys must match the loaded columns (case-insensitive), as found in the first row.
+    By default the rows are loaded into all columns except identity, computed and rowversion columns
+    (sequences must follow this order); identity values are loaded only with identity_insert.
+    Values are coerced to the column types from get_columns; rows that cannot be coerced or inserted are rejected.
+    On a failed batch the uncommitted rows are rolled back and re-inserted one by one to isolate rejected rows.
+    """
+    table_columns = list(get_columns(table, server, db))
+    if not table_columns:
+        raise UserWarning(f'Table {table} does not exist or has no columns')
+    if columns:
+        by_name = {c.name.lower(): c for c in table_columns}
+        missed = [c for c in columns if c.lower() not in by_name]
+        if missed:
+            raise UserWarning(f'Columns {missed} do not exist in {table}')
+        table_columns = [by_name[c.lower()] for c in columns]
+        generated = [c.name for c in table_columns if c.is_generated]
+        if generated:
+            raise UserWarning(f'Columns {generated} of {table} are computed or rowversion and cannot be loaded')
+        identity = [c.name for c in table_columns if c.is_identity]
+        if identity and not identity_insert:
+            raise UserWarning(f'Column {identity[0]} of {table} is identity, use identity_insert to load it')
+    else:
+        table_columns = [c for c in table_columns
+                         if not c.is_generated and (identity_insert or not c.is_identity)]
+
+    query = f"insert into {table} ({', '.join(f'[{c.name}]' for c in table_columns)}) " \
+            f"values ({', '.join('?' for _ in table_columns)})"
+    commit_every = max(commit_every, batch_size)
+    rows = _read_rows(source, delimiter, encoding)
+    first_row = next(rows, None)
+    keys = _row_keys(first_row, table_columns, table) if isinstance(first_row, dict) else None
+    result = BulkLoadResult(table)
+    start = perf_counter()
+    logger.info(f'Start bulk load to {server}.{db}.{table}')
+    with _connect(server, db, autocommit=False) as conn:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        if identity_insert:
+            _execute(cursor, f'set identity_insert {table} on')
+        pending = []  # rows since the last commit: (row number, source row, params)
+        batch_start = 0
+
+        def flush_batch():
+            nonlocal pending, batch_start
+            batch = pending[batch_start:]
+            if not batch:
+                return
+            result.batches += 1
+            try:
+                with metrics.timed('sql.executemany', len(batch)):
+                    cursor.executemany(query, [params for _, _, params in batch])
+                result.rows_loaded += len(batch)
+                batch_start = len(pending)
+            except _odbc_errors('Error') as ex:
+                logger.warning(f'Batch failed, reload {len(pending)} uncommitted rows one by one: {ex.args[-1]}')
+                conn.rollback()
+                result.rows_loaded -= batch_start
+                _reload_row_by_row(cursor, query, pending, result)
+                conn.commit()
+                pending, batch_start = [], 0
+
+        def commit():
+            nonlocal pending, batch_start
+            flush_batch()
+            conn.commit()
+            pending, batch_start = [], 0
+            result.duration = perf_counter() - start
+            logger.info(f'{table}: {result.rows_loaded} rows loaded, {len(result.rejected)} rejected, '
+                        f'{result.rows_per_sec:.0f} rows/s')
+
+        for row_number, row in enumerate(chain((first_row,), rows) if first_row is not None else (), 1):
+            result.rows_read = row_number
+            try:
+                pending.append((row_number, row, _prepare_row(row, table_columns, keys)))
+            except (ValueError, ArithmeticError, TypeError) as ex:
+                result.rejected.append((row_number, row, str(ex)))
+                continue
+            if len(pending) >= commit_every:
+                commit()
+            elif len(pending) - batch_start >= batch_size:
+                flush_batch()
+        commit()
+
+    result.duration = perf_counter() - start
+    logger.info(f'Finish bulk load to {server}.{db}.{table}: {result}')
+    return result
+
+
 def get_sql_message(sql_message_id, server, db):
     query = f"select text as message from sys.messages where language_id = 1033 and message_id = {sql_message_id}"
     cursor = sql_select(query, server, db)
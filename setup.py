@@ -21,9 +21,10 @@ def main():
         version=ms_admin_utils.__version__,
         author='Denis Stepanov',
         author_email='vutt.gray@gmail.com',
-        packages=find_packages(),
+        packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
         long_description=open(join(dirname(__file__), 'README.md')).read(),
         install_requires=requirements,
+        entry_points={'console_scripts': ['ms-admin = ms_admin_utils.cli:main']},
         )
 
 
@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.fake_odbc import catalog_backend, FakeOdbcError
+from ms_admin_utils import sql_wrapper, clickonce_wrapper, metrics
+
+
+@pytest.fixture
+def sql_backend(tmp_path, monkeypatch):
+    """Stand-in ODBC backend plugged into sql_wrapper, with a SQLite database created by the DDL"""
+    def make(ddl: str = None, **kwargs):
+        sqlite_path = None
+        if ddl:
+            sqlite_path = str(tmp_path / 'tests.sqlite')
+            with sqlite3.connect(sqlite_path) as db:
+                db.execute(ddl)
+        backend = catalog_backend(sqlite_path=sqlite_path, **kwargs)
+        monkeypatch.setattr(sql_wrapper, 'conf', sql_wrapper.SqlConfig(connector=backend.connect,
+                                                                        errors=FakeOdbcError))
+        return backend
+    return make
+
+
+@pytest.fixture
+def clickonce_root(tmp_path, monkeypatch):
+    root = tmp_path / 'clickonce'
+    monkeypatch.setattr(clickonce_wrapper, 'conf',
+                        clickonce_wrapper.ClickonceConfig(root_path=str(root), app_folder='Application Files'),
+                        raising=False)
+    return root
+
+
+@pytest.fixture
+def metrics_enabled():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
@@ -0,0 +1,10 @@
+from benchmarks.run import run_suites, SUITES
+from ms_admin_utils import sql_wrapper
+
+
+def test_benchmark_suites_run(monkeypatch):
+    # the sql suite plugs its own stand-in backend into sql_wrapper
+    monkeypatch.setattr(sql_wrapper, 'conf', sql_wrapper.conf)
+    report = run_suites(SUITES)
+    assert {r['suite'] for r in report['results']} == set(SUITES) - set(report['skipped'])
+    assert all(r['seconds'] >= 0 for r in report['results'])
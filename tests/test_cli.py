@@ -0,0 +1,47 @@
+from os import listdir
+
+import pytest
+
+from ms_admin_utils import cli
+
+
+def test_daemon_survives_bad_task_files(tmp_path):
+    queue = tmp_path / 'queue'
+    (queue / 'processing').mkdir(parents=True)
+    files = {'a.json': '["backup"]', 'b.json': '42', 'c.json': '{"type": "inventory"}',
+             'processing/d.json': '{"type": "inventory"}'}
+    for name, text in files.items():
+        (queue / name).write_text(text)
+    cli.serve_queue(str(queue), cli.AdminState({}), once=True)
+    assert sorted(listdir(queue / 'failed')) == ['a.json', 'b.json', 'd.json']
+    assert listdir(queue / 'done') == ['c.json']
+    assert not listdir(queue / 'processing')
+
+
+def test_one_daemon_per_queue(tmp_path):
+    with cli._lock_queue(str(tmp_path)):
+        with pytest.raises(cli.QueueLocked):
+            cli.serve_queue(str(tmp_path), cli.AdminState({}), once=True)
+    cli.serve_queue(str(tmp_path), cli.AdminState({}), once=True)
+
+
+def test_backup_and_restore_use_cached_databases(sql_backend, tmp_path):
+    backend = sql_backend(databases=2)
+    state = cli.AdminState({})
+    tasks = [{'type': 'inventory', 'servers': ['SQL01']},
+             {'type': 'backup', 'tasks': [{'type': 'sql', 'server': 'SQL01', 'target': str(tmp_path), 'freq': 1}]},
+             {'type': 'restore', 'params': {'server': 'SQL01', 'db': 'db_0', 'backup_path': 'db_0.bak',
+                                            'set_multi_user': False}}]
+    assert [r['status'] for r in cli.run_tasks(tasks, state)] == ['done'] * 3
+    assert len([q for q in backend.queries if 'from sys.databases' in q]) == 1
+    assert len([q for q in backend.queries if q.startswith('backup database')]) == 2
+    assert any('set single_user' in q for q in backend.queries)
+
+
+def test_backup_task_records_results(sql_backend, tmp_path):
+    sql_backend(databases=2)
+    task = {'type': 'backup', 'tasks': [{'type': 'sql', 'server': 'SQL01', 'target': str(tmp_path), 'freq': 1}]}
+    record = cli.run_task(task, cli.AdminState({}))
+    assert record['status'] == 'done'
+    assert [r['db'] for r in record['result'][0]] == ['db_0', 'db_1']
+    assert all(r['error'] is None and r['finished'] for r in record['result'][0])
@@ -0,0 +1,108 @@
+from datetime import date, datetime
+from os import listdir, stat, utime, path as os_path
+from shutil import copytree
+
+import pytest
+
+from benchmarks.fixtures import make_clickonce_root
+from ms_admin_utils import clickonce_wrapper
+
+
+@pytest.fixture
+def app_factory(clickonce_root, tmp_path):
+    """An application with the version folders App0_1_0_0_N, and a source folder: the last version plus app.exe"""
+    def make(prefix: str = 'App0', versions: int = 3):
+        make_clickonce_root(str(clickonce_root), apps=1, versions=versions, files_per_version=2)
+        app_path = clickonce_root / 'app_0' / 'Application Files'
+        source = tmp_path / 'source'
+        copytree(app_path / f'App0_1_0_0_{versions}', source)
+        (source / 'app.exe').write_bytes(b'new build')
+        return clickonce_wrapper.ClickonceApplication(folder='app_0', prefix=prefix), app_path, str(source)
+    return make
+
+
+def test_index_snapshot(clickonce_root, tmp_path):
+    make_clickonce_root(str(clickonce_root), apps=2, versions=3)
+    snapshot = str(tmp_path / 'index.json')
+    index = clickonce_wrapper.ClickonceIndex(snapshot)
+    assert sorted(index.refresh()) == ['app_0', 'app_1']
+    assert not (tmp_path / 'index.json.tmp').exists()
+    assert clickonce_wrapper.ClickonceIndex(snapshot).last_version('app_0') == index.last_version('app_0')
+
+    (tmp_path / 'index.json').write_text('{"root_path": "')  # truncated by a crash
+    index = clickonce_wrapper.ClickonceIndex(snapshot)
+    assert not index.apps and sorted(index.refresh()) == ['app_0', 'app_1']
+
+
+def test_publish_links_unchanged_files(app_factory):
+    # the configured prefix differs from the folder names on disk
+    app, app_path, source = app_factory(prefix='MyApp')
+    assert app.last_version.folder == 'App0_1_0_0_3'
+    result = app.publish(source)
+    assert (result.files_linked, result.files_copied) == (2, 1)
+    assert app.last_version.folder == 'App0_1_0_0_4'
+    assert result.version_path == str(app_path / 'App0_1_0_0_4')
+    assert stat(app_path / 'App0_1_0_0_4' / 'lib_0.dll').st_ino == stat(app_path / 'App0_1_0_0_3' / 'lib_0.dll').st_ino
+
+
+def test_failed_publish_leaves_no_folder(app_factory, monkeypatch):
+    def failing_copy(src, dst):
+        raise OSError('disk full')
+
+    app, app_path, source = app_factory()
+    with monkeypatch.context() as m:
+        m.setattr(clickonce_wrapper, 'copy2', failing_copy)
+        with pytest.raises(OSError):
+            app.publish(source)
+    assert sorted(listdir(app_path)) == ['App0_1_0_0_1', 'App0_1_0_0_2', 'App0_1_0_0_3']
+    assert app.last_version.folder == 'App0_1_0_0_3'
+
+    result = app.publish(source)
+    assert (app_path / 'App0_1_0_0_4' / 'app.exe').is_file() and result.version_path.endswith('App0_1_0_0_4')
+
+
+def test_prune_keeps_last_version(app_factory):
+    app, app_path, source = app_factory(prefix='MyApp', versions=5)
+    result = app.prune_versions(keep_since=date(2020, 1, 5))
+    assert sorted(result.removed) == ['MyApp_1.0.0.1', 'MyApp_1.0.0.2', 'MyApp_1.0.0.3']
+
+    app.publish(source)
+    # the files of version 5 are hardlinked by the published version 6 and are not freed
+    result = app.prune_versions(keep_last=0)
+    assert sorted(result.removed) == ['MyApp_1.0.0.4', 'MyApp_1.0.0.5']
+    assert result.bytes_freed == 2 * 256
+    assert listdir(app_path) == ['App0_1_0_0_6'] and list(app.versions) == ['MyApp_1.0.0.6']
+
+
+def test_index_rescans_changed_last_version(clickonce_root):
+    make_clickonce_root(str(clickonce_root), apps=2, versions=3)
+    index = clickonce_wrapper.ClickonceIndex()
+    index.refresh()
+    assert index.refresh() == []
+    # files copied into the last version folder change its mtime, not the application folder mtime
+    ts = datetime(2021, 6, 1).timestamp()
+    utime(clickonce_root / 'app_0' / 'Application Files' / 'App0_1_0_0_3', (ts, ts))
+    assert index.refresh() == ['app_0']
+    assert index.last_version('app_0') == ('1.0.0.3', date(2021, 6, 1), 'App0_1_0_0_3')
+
+
+def test_index_refresh_skips_unreadable_apps(clickonce_root, monkeypatch):
+    make_clickonce_root(str(clickonce_root), apps=3, versions=2)
+    file_stat = clickonce_wrapper.file_stat
+    scan = clickonce_wrapper._scan_clickonce_versions
+
+    def denied_stat(path):
+        if path == os_path.join(str(clickonce_root), 'app_1', 'Application Files'):
+            raise PermissionError(13, 'Access is denied', path)
+        return file_stat(path)
+
+    def removed_scan(app_path):
+        if 'app_2' in app_path:
+            raise FileNotFoundError(2, 'No such file or directory', app_path)  # removed after the listing
+        return scan(app_path)
+
+    monkeypatch.setattr(clickonce_wrapper, 'file_stat', denied_stat)
+    monkeypatch.setattr(clickonce_wrapper, '_scan_clickonce_versions', removed_scan)
+    index = clickonce_wrapper.ClickonceIndex()
+    assert index.refresh() == ['app_0']
+    assert list(index.apps) == ['app_0']
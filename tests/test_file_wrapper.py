@@ -0,0 +1,17 @@
+from benchmarks.fixtures import make_tree
+from ms_admin_utils import file_wrapper
+
+
+def test_walk_and_stat_are_timed_despite_failing_hook(tmp_path, metrics_enabled):
+    def failing_hook(name, seconds, value):
+        raise ConnectionError('dashboard is down')
+
+    files = make_tree(str(tmp_path), dirs=2, depth=1, files_per_dir=3)
+    metrics_enabled.add_hook(failing_hook)
+    try:
+        assert sum(1 for _ in file_wrapper.walk_through_files(str(tmp_path), [])) == files
+    finally:
+        metrics_enabled.remove_hook(failing_hook)
+    stats = metrics_enabled.snapshot()
+    assert stats['file.walk_dir']['count'] == 3 and stats['file.walk_dir']['value'] == files
+    assert stats['file.stat']['count'] == files and stats['file.stat']['seconds'] > 0
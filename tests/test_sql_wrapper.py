@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ms_admin_utils import sql_wrapper, file_wrapper
+
+
+def _column(type_name: str, max_length: int):
+    return SimpleNamespace(name='c', type=type_name, max_length=max_length, is_nullable=True)
+
+
+def test_bulk_load_skips_identity(sql_backend):
+    backend = sql_backend('create table t (id integer primary key, name text not null)')
+    result = sql_wrapper.bulk_load([{'name': 'a'}, {'name': 'b'}], 't', 'SQL01', 'db')
+    assert result.rows_loaded == 2 and not result.rejected
+    assert backend.sqlite.execute('select id, name from t order by id').fetchall() == [(1, 'a'), (2, 'b')]
+
+    result = sql_wrapper.bulk_load([(10, 'c')], 't', 'SQL01', 'db', columns=['id', 'name'], identity_insert=True)
+    assert result.rows_loaded == 1
+    assert any(q.startswith('set identity_insert t on') for q in backend.queries)
+
+
+def test_bulk_load_rejects_duplicate_rows(sql_backend):
+    backend = sql_backend('create table t (id integer not null unique, name text)')
+    result = sql_wrapper.bulk_load([(1, 'a'), (1, 'dup'), (2, 'b')], 't', 'SQL01', 'db')
+    assert result.rows_loaded == 2
+    assert [(n, row) for n, row, _ in result.rejected] == [(2, (1, 'dup'))]
+    assert backend.sqlite.execute('select id, name from t order by id').fetchall() == [(1, 'a'), (2, 'b')]
+
+
+def test_bulk_load_matches_dict_keys_case_insensitively(sql_backend, tmp_path):
+    backend = sql_backend('create table t (id integer not null, name text)')
+    path = tmp_path / 'rows.csv'
+    path.write_text('id,Name\n1,a\n2,b\n')
+    result = sql_wrapper.bulk_load(str(path), 't', 'SQL01', 'db')
+    assert result.rows_loaded == 2 and not result.rejected
+    result = sql_wrapper.bulk_load([{'NAME': 'c', 'ID': 3}], 't', 'SQL01', 'db', columns=['ID', 'NAME'])
+    assert result.rows_loaded == 1
+    assert backend.sqlite.execute('select id, name from t order by id').fetchall() == [(1, 'a'), (2, 'b'), (3, 'c')]
+
+
+@pytest.mark.parametrize('rows', [[{'id': 1, 'name': 'a', 'extra': 'x'}], [{'id': 1}]])
+def test_bulk_load_checks_dict_keys(sql_backend, rows):
+    backend = sql_backend('create table t (id integer not null, name text)')
+    with pytest.raises(UserWarning):
+        sql_wrapper.bulk_load(rows, 't', 'SQL01', 'db')
+    assert not any(q.startswith('insert') for q in backend.queries)
+
+
+def test_bulk_load_rejects_rows_with_other_keys(sql_backend, tmp_path):
+    sql_backend('create table t (id integer not null, name text)')
+    path = tmp_path / 'rows.ndjson'
+    path.write_text('{"id": 1, "name": "a"}\n{"id": 2}\n{"id": 3, "name": "c", "extra": 1}\n')
+    result = sql_wrapper.bulk_load(str(path), 't', 'SQL01', 'db')
+    assert result.rows_loaded == 1 and [n for n, _, _ in result.rejected] == [2, 3]
+
+def test_bulk_load_rejects_json_array_file(tmp_path):
+    path = tmp_path / 'rows.json'
+    path.write_text('[{"name": "a"}]')
+    with pytest.raises(ValueError):
+        sql_wrapper._read_rows(str(path), ',', 'utf-8')
+
+
+def test_coerce_checks_length_of_limited_strings_only():
+    guid = '6F9619FF-8B86-D011-B42D-00C04FC964FF'
+    assert sql_wrapper._coerce_value(guid, _column('uniqueidentifier', 16)) == guid
+    assert sql_wrapper._coerce_value('x' * 100, _column('ntext', 16)) == 'x' * 100
+    with pytest.raises(ValueError):
+        sql_wrapper._coerce_value('x' * 11, _column('nvarchar', 20))
+
+
+def test_sql_update_returns_error(sql_backend):
+    sql_backend('create table t (id integer)')
+    error = sql_wrapper.sql_update('update missing set id = 1', 'SQL01', 'db', expected_result=False)
+    assert 'missing' in error
+
+
+def test_columnar_result_keeps_values():
+    description = [('id', int, None, None, None, None, False), ('flag', bool, None, None, None, None, False),
+                   ('name', str, None, None, None, None, True)]
+    rows = [(1, True, 'a'), (2, False, None)]
+    result = sql_wrapper.ColumnarResult.from_description(description)
+    for row in rows:
+        result.append(row)
+    assert result.to_rows() == rows
+    assert [type(r.flag) for r in result.rows()] == [bool, bool]
+
+
+def test_sql_backup_task_options(sql_backend, tmp_path):
+    backend = sql_backend(databases=2)
+    task = {'type': 'sql', 'server': 'SQL01', 'target': [str(tmp_path)], 'freq': 1,
+            'checksum': False, 'copy_only': True}
+    file_wrapper.backup([task])
+    backups = [q for q in backend.queries if q.startswith('backup database')]
+    assert len(backups) == 2
+    # no compression option: the server default is kept, e.g. on the Express edition
+    assert all('compression' not in q and 'checksum' not in q and 'copy_only' in q for q in backups)
+    assert (tmp_path / 'backup_journal.json').is_file()
+
+    file_wrapper.backup([dict(task, compression=False)])  # not due again within the frequency
+    assert len([q for q in backend.queries if q.startswith('backup database')]) == 2
+
+
+def test_backup_runs_all_tasks_and_returns_results(sql_backend, tmp_path):
+    sql_backend(databases=2)
+    source = tmp_path / 'app.config'
+    source.write_text('<configuration/>')
+    (tmp_path / 'zip').mkdir()
+    tasks = [{'type': 'sql', 'server': 'SQL01', 'target': str(tmp_path / 'bad'), 'freq': 1, 'dbs': ['db_0'],
+              'backup_type': 'unknown'},
+             {'type': 'zip', 'source': str(source), 'target': str(tmp_path / 'zip'), 'freq': 1, 'freq_unit': 'day',
+              'file_format': 'zip'},
+             {'type': 'sql', 'server': 'SQL02', 'target': str(tmp_path / 'sql'), 'freq': 1}]
+    with pytest.raises(file_wrapper.BackupTaskFailed) as failed:
+        file_wrapper.backup(tasks)
+    bad, archive, good = failed.value.results
+    assert [r.db for r in bad] == ['db_0'] and bad[0].error
+    assert archive.endswith('.zip') and (tmp_path / 'zip' / archive).is_file()
+    assert [r.db for r in good] == ['db_0', 'db_1'] and not any(r.error for r in good)
+    assert str(failed.value).startswith('task 0: 1 of 1 backups failed on SQL01')